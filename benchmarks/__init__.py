@@ -0,0 +1,3 @@
+"""
+Benchmarks of the taxonomy, classifier and domain operations, run with python -m benchmarks.run
+"""
@@ -0,0 +1,285 @@
+"""
+Measures the latency of each operation on synthetic structures of growing size, and writes the results as json.
+
+    python -m benchmarks.run --sizes 1000 10000 100000 --output results.json
+    python -m benchmarks.run --baseline results.json
+
+Each benchmark times a run of operations on a structure of the given size, keeping the best of the repeats.
+The scaling exponent between two sizes is log(latency ratio) / log(size ratio): around 0 for an operation whose cost
+does not grow with the structure, around 1 for one that is linear in it, which makes a loop of them quadratic.
+"""
+import argparse
+import json
+import math
+import platform
+import sys
+import time
+from functools import cached_property
+from typing import Any, Callable, Optional
+
+from pydantic import BaseModel
+
+from src.validation import trusted
+from src.taxonomy import BaseClassifier, add_taxonomic_item, newExclusiveClassification, newInclusiveClassification
+from src.composition import GRAPH, DOMAIN_INDEXES, Domain, addNode, addThing, buildDomain, composeThing, embodyThing
+
+from .synthetic import synthetic_taxonomy, synthetic_domain
+
+
+class Fixtures:
+    """
+    The synthetic structures of one size, built when a benchmark first needs them.
+    """
+
+    def __init__(self, size: int, branching: int, depth: int):
+        self.size = size
+        self.branching = branching
+        self.depth = depth
+
+    @cached_property
+    def taxonomy(self):
+        return synthetic_taxonomy(self.size, self.branching, self.depth)
+
+    @cached_property
+    def exclusive_classifier(self):
+        classifier, _ = newExclusiveClassification(target_type = int, taxonomy = self.taxonomy).classify_many(
+            (self.taxonomy.items[index % self.size], index) for index in range(self.size)
+        )
+        return classifier
+
+    @cached_property
+    def inclusive_classifier(self):
+        classifier, _ = newInclusiveClassification(target_type = int, taxonomy = self.taxonomy).classify_many(
+            (self.taxonomy.items[index % self.size], index) for index in range(self.size)
+        )
+        return classifier
+
+    @cached_property
+    def domain(self):
+        return synthetic_domain(self.size, self.branching, self.depth)
+
+
+# the benchmarks by name, each taking the fixtures and the count of operations,
+# and returning the preparation of each repeat, untimed, and the run to time, which takes what the preparation returns
+Benchmark = Callable[[Fixtures, int], tuple[Callable[[], Any], Callable[[Any], None]]]
+BENCHMARKS: dict[str, Benchmark] = {}
+
+
+def benchmark(name: str):
+    def register(function: Benchmark):
+        BENCHMARKS[name] = function
+        return function
+    return register
+
+
+def _spread(fixtures: Fixtures, operations: int):
+    # the positions of the targets of the operations, spread over the structure
+    return [(index * 7919) % fixtures.size for index in range(operations)]
+
+
+def _latest(model: BaseModel, *warm_ups: Callable[[Any], Any]):
+    # a fresh version of the model with its indexes built, as the latest version appends to its indexes in place,
+    # while an older one, like the fixture after the first repeat, copies them on its first append
+    fresh = trusted(type(model), **dict(model))
+    for warm_up in warm_ups:
+        warm_up(fresh)
+    return fresh
+
+
+@benchmark('add_taxonomic_item')
+def add_taxonomic_item_benchmark(fixtures: Fixtures, operations: int):
+    taxonomy = fixtures.taxonomy
+    parents = [taxonomy.items[position] for position in _spread(fixtures, operations)]
+    def run(taxonomy):
+        for index, parent in enumerate(parents):
+            taxonomy = add_taxonomic_item(taxonomy, f"new{index}", parent)
+    return lambda: taxonomy, run
+
+
+def _query_benchmark(query: Callable[[Any, Any], Any], targets_of: Callable[[Fixtures, int], list]):
+    def query_benchmark(fixtures: Fixtures, operations: int):
+        taxonomy = fixtures.taxonomy
+        targets = targets_of(fixtures, operations)
+        def run(taxonomy):
+            for target in targets:
+                query(taxonomy, target)
+        return lambda: taxonomy, run
+    return query_benchmark
+
+
+def _spread_items(fixtures: Fixtures, operations: int):
+    return [fixtures.taxonomy.items[position] for position in _spread(fixtures, operations)]
+
+
+def _last_items(fixtures: Fixtures, operations: int):
+    # the deepest items, so that the size of the subtrees does not grow with the taxonomy
+    return list(fixtures.taxonomy.items[-operations:])
+
+
+benchmark('get_children')(_query_benchmark(lambda taxonomy, target: taxonomy.get_children(target), _spread_items))
+benchmark('get_decendents')(_query_benchmark(lambda taxonomy, target: taxonomy.get_decendents(target), _last_items))
+benchmark('get_index')(_query_benchmark(lambda taxonomy, target: taxonomy.get_index(target), _spread_items))
+
+
+def _classify_benchmark(classifier_of: Callable[[Fixtures], BaseClassifier]):
+    def classify_benchmark(fixtures: Fixtures, operations: int):
+        classifier = classifier_of(fixtures)
+        items = _spread_items(fixtures, operations)
+        def run(classifier):
+            for index, item in enumerate(items):
+                classifier = classifier.classify(taxonomic_item = item, classification_target = fixtures.size + index)
+        return lambda: _latest(classifier, BaseClassifier.get_instance_index), run
+    return classify_benchmark
+
+
+benchmark('ExclusiveClassifier.classify')(_classify_benchmark(lambda fixtures: fixtures.exclusive_classifier))
+benchmark('InclusiveClassifier.classify')(_classify_benchmark(lambda fixtures: fixtures.inclusive_classifier))
+
+
+def _latest_domain(domain: Domain):
+    return _latest(domain, *(lambda fresh, attribute = attribute: fresh.get_domain_index(attribute) for attribute in DOMAIN_INDEXES))
+
+
+@benchmark('addThing')
+def add_thing_benchmark(fixtures: Fixtures, operations: int):
+    def run(domain):
+        for index in range(operations):
+            domain = addThing(domain, f"new{index}")
+    return lambda: _latest_domain(fixtures.domain), run
+
+
+@benchmark('addNode')
+def add_node_benchmark(fixtures: Fixtures, operations: int):
+    def run(domain):
+        for index in range(operations):
+            domain = addNode(domain, GRAPH.MATERIAL, f"new{index}")
+    return lambda: _latest_domain(fixtures.domain), run
+
+
+def _with_new_things(domain: Domain, operations: int):
+    # the domain with things which are neither composed nor embodied yet, as targets of the timed operations
+    domain, _ = buildDomain(things = (f"new{index}" for index in range(operations)), domain = domain)
+    return domain, list(domain.things[-operations:])
+
+
+@benchmark('composeThing')
+def compose_thing_benchmark(fixtures: Fixtures, operations: int):
+    domain, things = _with_new_things(fixtures.domain, operations)
+    parents = [domain.things[position] for position in _spread(fixtures, operations)]
+    def run(domain):
+        for parent, thing in zip(parents, things):
+            domain = composeThing(domain, of = parent, by = thing)
+    return lambda: _latest_domain(domain), run
+
+
+@benchmark('embodyThing')
+def embody_thing_benchmark(fixtures: Fixtures, operations: int):
+    domain, things = _with_new_things(fixtures.domain, operations)
+    materials = domain.materials
+    def run(domain):
+        for index, thing in enumerate(things):
+            domain = embodyThing(domain, of = thing, by = materials[index % len(materials)])
+    return lambda: _latest_domain(domain), run
+
+
+def measure(prepared: tuple[Callable[[], Any], Callable[[Any], None]], operations: int, repeat: int):
+    # the best seconds per operation over the repeats
+    prepare, run = prepared
+    best = math.inf
+    for _ in range(repeat):
+        state = prepare()
+        start = time.perf_counter()
+        run(state)
+        best = min(best, time.perf_counter() - start)
+    return best / operations
+
+
+def run_benchmarks(sizes: list[int], operations: int = 200, repeat: int = 3, branching: int = 4, depth: int = 6, only: Optional[list[str]] = None):
+    results = []
+    for size in sizes:
+        fixtures = Fixtures(size, branching, depth)
+        for name, build in BENCHMARKS.items():
+            if only and name not in only:
+                continue
+            count = min(operations, size)
+            results.append({
+                'benchmark': name,
+                'size': size,
+                'operations': count,
+                'seconds_per_operation': measure(build(fixtures, count), count, repeat),
+            })
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'operations': operations,
+            'repeat': repeat,
+            'branching': branching,
+            'depth': depth,
+        },
+        'results': results,
+        'scaling': scaling(results),
+    }
+
+
+def scaling(results: list[dict]):
+    # the scaling exponent of each benchmark between each pair of successive sizes
+    by_benchmark: dict[str, list[dict]] = {}
+    for result in results:
+        by_benchmark.setdefault(result['benchmark'], []).append(result)
+    exponents = []
+    for name, runs in by_benchmark.items():
+        runs = sorted(runs, key = lambda result: result['size'])
+        for smaller, larger in zip(runs, runs[1:]):
+            exponents.append({
+                'benchmark': name,
+                'sizes': [smaller['size'], larger['size']],
+                'exponent': math.log(larger['seconds_per_operation'] / smaller['seconds_per_operation']) / math.log(larger['size'] / smaller['size']),
+            })
+    return exponents
+
+
+def compare(results: dict, baseline: dict, threshold: float):
+    # the (benchmark, size, ratio) of every result slower than the baseline by more than the threshold ratio
+    baseline_latencies = {(result['benchmark'], result['size']): result['seconds_per_operation'] for result in baseline['results']}
+    regressions = []
+    for result in results['results']:
+        before = baseline_latencies.get((result['benchmark'], result['size']))
+        if before is not None and result['seconds_per_operation'] > before * threshold:
+            regressions.append((result['benchmark'], result['size'], result['seconds_per_operation'] / before))
+    return regressions
+
+
+def main(arguments: Optional[list[str]] = None):
+    parser = argparse.ArgumentParser(description = __doc__, formatter_class = argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type = int, nargs = '+', default = [1000, 10000, 100000])
+    parser.add_argument('--operations', type = int, default = 200, help = 'operations timed per benchmark and size')
+    parser.add_argument('--repeat', type = int, default = 3)
+    parser.add_argument('--branching', type = int, default = 4)
+    parser.add_argument('--depth', type = int, default = 6)
+    parser.add_argument('--only', nargs = '+', choices = sorted(BENCHMARKS), help = 'the benchmarks to run, all by default')
+    parser.add_argument('--output', help = 'the json file to write the results to')
+    parser.add_argument('--baseline', help = 'a json file of earlier results, to report the regressions against')
+    parser.add_argument('--threshold', type = float, default = 1.5, help = 'the latency ratio over the baseline reported as a regression')
+    options = parser.parse_args(arguments)
+
+    results = run_benchmarks(options.sizes, options.operations, options.repeat, options.branching, options.depth, options.only)
+    for result in results['results']:
+        print(f"{result['benchmark']:<32} {result['size']:>8} {result['seconds_per_operation'] * 1e6:>12.2f} us")
+    for exponent in results['scaling']:
+        print(f"{exponent['benchmark']:<32} {exponent['sizes'][0]:>8} -> {exponent['sizes'][1]:<8} exponent {exponent['exponent']:.2f}")
+    if options.output:
+        with open(options.output, 'w') as file:
+            json.dump(results, file, indent = 2)
+    if options.baseline:
+        with open(options.baseline) as file:
+            regressions = compare(results, json.load(file), options.threshold)
+        for name, size, ratio in regressions:
+            print(f"regression: {name} at {size} is {ratio:.2f}x the baseline")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
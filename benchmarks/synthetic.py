@@ -0,0 +1,43 @@
+"""
+Synthetic taxonomies and domains of a given size, shaped as trees of controllable branching and depth.
+"""
+from src.taxonomy import Taxonomy, TaxonomicItem, create_taxonomy, add_taxonomic_items
+from src.composition import Domain, buildDomain
+
+
+def synthetic_tree(size: int, branching: int = 4, depth: int = 6):
+    # the parent index of each node, breadth first, -1 for roots, with as many roots as the size needs within the depth
+    per_root = sum(branching ** level for level in range(depth + 1))
+    roots = min(size, -(-size // per_root))
+    parents = [-1] * roots
+    levels = [0] * roots
+    position = 0
+    while len(parents) < size:
+        if levels[position] < depth:
+            for _ in range(min(branching, size - len(parents))):
+                parents.append(position)
+                levels.append(levels[position] + 1)
+        position += 1
+    return parents
+
+
+def synthetic_taxonomy(size: int, branching: int = 4, depth: int = 6, name: str = "synthetic") -> Taxonomy:
+    names = [f"item{index}" for index in range(size)]
+    return add_taxonomic_items(create_taxonomy(name = name), (
+        (item_name, TaxonomicItem(name = names[parent]) if parent != -1 else None)
+        for item_name, parent in zip(names, synthetic_tree(size, branching, depth))
+    ))
+
+
+def synthetic_domain(size: int, branching: int = 4, depth: int = 6, materials: int = 10, embodied: float = 0.5) -> Domain:
+    # a composition tree of things, the given share of them embodied by one of the materials
+    things = [f"thing{index}" for index in range(size)]
+    material_names = [f"material{index}" for index in range(materials)]
+    step = round(1 / embodied) if embodied else 0
+    domain, _ = buildDomain(
+        things = things,
+        materials = material_names,
+        compositions = ((things[parent], thing) for thing, parent in zip(things, synthetic_tree(size, branching, depth)) if parent != -1),
+        embodiments = ((things[index], material_names[index % materials]) for index in range(0, size, step)) if step else (),
+    )
+    return domain
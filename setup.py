@@ -9,7 +9,8 @@ setup(
     python_requires=">=3.7, <4",
     install_requires=["pydantic"],
     extras_require={  # Optional
-        "dev": ["pip-tools", "mypy", "rich"]
+        "dev": ["pip-tools", "mypy", "rich"],
+        "columnar": ["numpy"],
     },
     package_dir={"": "src"},
 )
@@ -0,0 +1,69 @@
+"""
+Vectorised queries over the node id columns of the domain relationships, for analysis over millions of edges.
+
+NumPy is an optional dependency, installed with the columnar extra: without it the module still imports, and the queries raise an ImportError.
+"""
+from typing import Optional, Union
+
+from .composition import Domain, EDGE_COLUMNS, Thing, Material, System
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def _require_numpy():
+    if numpy is None:
+        raise ImportError('The columnar queries need numpy, which is installed with the columnar extra')
+    return numpy
+
+
+def edgeIds(domain: Domain, container: str, end: str):
+    # the node ids at one end of the relationships of the container, with -1 for nodes outside the domain
+    np = _require_numpy()
+    return np.frombuffer(domain.get_edge_ids(container, end), dtype = np.intc)
+
+
+def findEdges(domain: Domain, container: str, of: Optional[Union[Thing, Material, System]] = None, by: Optional[Union[Thing, Material, System]] = None, system: Optional[System] = None):
+    # the positions of the relationships of the container with the given nodes at their ends, e.g. the operations by a fuel
+    np = _require_numpy()
+    selected = np.ones(len(getattr(domain, container)), dtype = bool)
+    for end, node in (('of', of), ('by', by), ('system', system)):
+        if node is None:
+            continue
+        node_id = domain.get_node_id(EDGE_COLUMNS[(container, end)], node)
+        if not node_id:
+            # Early return as a node outside the domain is at the end of no relationship
+            return np.empty(0, dtype = np.intp)
+        selected &= edgeIds(domain, container, end) == node_id[0]
+    return np.flatnonzero(selected)
+
+
+def countDegrees(domain: Domain, container: str, end: str):
+    # the count of relationships of the container at each node, indexed by node id
+    np = _require_numpy()
+    ids = edgeIds(domain, container, end)
+    nodes = len(domain.get_element_container(EDGE_COLUMNS[(container, end)]))
+    return np.bincount(ids[ids >= 0], minlength = nodes)
+
+
+def joinEdges(domain: Domain, left: str, right: str, on: tuple[str, str] = ('by', 'of')):
+    """
+    Pairs the relationships of two containers which share a node, e.g. the provenances and operations where provenance.by is operation.of.
+
+    Returns the positions of the paired relationships, as two arrays of the same length ordered by the left position.
+    """
+    np = _require_numpy()
+    left_ids = edgeIds(domain, left, on[0])
+    right_ids = edgeIds(domain, right, on[1])
+    # sort the right side once, then find the run of matching right relationships of each left one
+    order = np.argsort(right_ids, kind = 'stable')
+    sorted_ids = right_ids[order]
+    starts = np.searchsorted(sorted_ids, left_ids, side = 'left')
+    counts = np.searchsorted(sorted_ids, left_ids, side = 'right') - starts
+    counts[left_ids < 0] = 0
+    left_positions = np.repeat(np.arange(len(left_ids)), counts)
+    offsets = np.arange(len(left_positions)) - np.repeat(np.cumsum(counts) - counts, counts)
+    right_positions = order[np.repeat(starts, counts) + offsets]
+    return left_positions, right_positions
@@ -1,6 +1,11 @@
-from pydantic import BaseModel, ValidationError, validator, Field, root_validator
-from typing import Union, Literal
+from pydantic import BaseModel, ValidationError, validator, Field, root_validator, PrivateAttr
+from typing import Union, Literal, Optional, Callable, Iterable
 from enum import Enum, Flag, auto
+from heapq import merge
+
+from .validation import trusted
+from .instrumentation import instrumented
+from .persistent import AppendColumn, AppendIndex, AppendMultiIndex, PersistentModel, PersistentVector
 
 
 class GRAPH(Flag):
@@ -10,7 +15,7 @@ class GRAPH(Flag):
 
     def __new__(cls, singular, plural):
         obj = object.__new__(cls)
-        obj._value_ = len(cls.__members__) + 1
+        obj._value_ = 1 << len(cls.__members__) # one bit per element, so that combined flags hold exactly their members
         obj._name_ = singular
         obj.singular = singular
         obj.plural = plural
@@ -78,8 +83,9 @@ class Composition(BaseModel):
     by: Thing
 
     @validator('by')
+    @instrumented
     def composition_loop(cls, v, values):
-        if v == values['of']:
+        if _node_key(v) == _node_key(values['of']):
             raise ValueError('A thing must not be composed of itself')
         return v
 
@@ -95,8 +101,9 @@ class Provenance(BaseModel):
     
 
     @root_validator
+    @instrumented
     def act_loop(cls, values):
-        if values['of'] == values['by']:
+        if _node_key(values['of']) == _node_key(values['by']):
             raise ValueError('A thing must not be acted upon by itself')
         return values
 
@@ -106,8 +113,9 @@ class Operation(BaseModel):
     by: Thing # e.g. fuel
 
     @root_validator
+    @instrumented
     def act_loop(cls, values):
-        if values['of'] == values['by']:
+        if _node_key(values['of']) == _node_key(values['by']):
             raise ValueError('A thing must not act upon itself')
         return values
 
@@ -117,8 +125,9 @@ class ProvOpCorrespondance(BaseModel):
     operation: Operation
     
     @root_validator
+    @instrumented
     def correspondance_integrity(cls, values):
-        if not values['provenance'].by == values['operation'].of:
+        if _node_key(values['provenance'].by) != _node_key(values['operation'].of):
             raise ValueError('The provenance by-thing does not match the operation of-thing')
         return values
     
@@ -141,9 +150,11 @@ class Activity(BaseModel):
     operations: list[Operation] # should there be two types of influence - active and passive, the latter without ops?
 
     @root_validator
+    @instrumented
     def operation_integrity(cls, values):
+        of_key = _node_key(values['of'])
         for op in values['operations']:
-            if not op.of == values['of']:
+            if _node_key(op.of) != of_key:
                 raise ValueError('An operation is included where the operations\' operating-thing does not match the activity influencing-thing')
         return values
     #todo validate operation
@@ -162,37 +173,280 @@ class Influence(BaseModel):
         return self.containing.by
 
 
-class Domain(BaseModel):
-    things: tuple[Thing, ...] = [] # the total of things
-    materials: tuple[Material, ...] = [] # the total of materials
-    embodiments: tuple[Embodiment, ...] = [] # the total thing-material embodiment relationships
-    materialisation: tuple[Thing, ...] = [] # the total of things which are embodied
-    compositions: tuple[Composition, ...] = [] # the total of thing-thing composition relationships
-    systems: tuple[System, ...] = [] # the total of systems
-    provenances: tuple[Provenance, ...] = [] # the total of thing-thing influence relationships in systems
-    operations: tuple[Operation, ...] = [] # the total of thing-thing influence relationships in systems
-    correspondances: tuple[ProvOpCorrespondance, ...] = [] # the total of provenance-operation correspondances
-    influences: tuple[Influence, ...] = [] # the total of thing-thing influence relationships in systems
-    activities: tuple[Activity, ...] = []
-    passivities: tuple[Passivity, ...] = []
+class REJECTION(Enum):
+    """
+    Enumeration of the reasons for refusing a row of a bulk domain load.
+    """
+    DUPLICATE_NODE = auto() # a node of the same name is already part of the domain
+    UNKNOWN_NODE = auto() # a node referenced by the row is not part of the domain
+    SELF_LOOP = auto() # both ends of the relationship are the same thing
+    MANY_PARENTS = auto() # the composing thing already composes another thing, which would break the tree
+    CYCLE = auto() # the composing thing is the composed thing or one of its ancestors, which would break the tree
+    EMBODIED = auto() # the thing is already embodied by a material
+    UNKNOWN_RELATIONSHIP = auto() # a provenance or operation referenced by the row is not part of the domain
+    MISMATCH = auto() # the provenance by-thing is not the operation of-thing, or an operation is not of the activity of-thing
+    UNKNOWN_ELEMENT = auto() # the record is of no element which loads on its own, influences loading as passivities and activities
+
+
+def _node_key(node: Union[Thing, Material, System]):
+    # nodes compare by value, so their name stands in for them as a hash key
+    return getattr(node, 'name', None)
+
+
+def _correspondance_key(provenance: Provenance, operation: Operation):
+    return (_node_key(provenance.of), _node_key(provenance.by)), (_node_key(operation.of), _node_key(operation.by))
+
+
+# the lazily built indexes of a domain: the container each of them indexes, and the key of the container elements
+# evolveDomain keeps every index which is already built up to date with the elements appended to its container
+DOMAIN_INDEXES = {
+    '_thing_index': ('things', _node_key, AppendIndex), # the position of each thing, which is its id
+    '_material_index': ('materials', _node_key, AppendIndex), # the position of each material, which is its id
+    '_system_index': ('systems', _node_key, AppendIndex), # the position of each system, which is its id
+    '_child_index': ('compositions', lambda composition: _node_key(composition.by), AppendIndex), # the composition of each thing to its parent
+    '_parent_index': ('compositions', lambda composition: _node_key(composition.of), AppendMultiIndex), # the compositions of each thing to its children
+    '_embodiment_index': ('embodiments', lambda embodiment: _node_key(embodiment.of), AppendIndex), # the embodiment of each thing
+    '_provenance_index': ('provenances', lambda provenance: _node_key(provenance.by), AppendMultiIndex), # the provenances by each thing
+    '_operation_index': ('operations', lambda operation: _node_key(operation.of), AppendMultiIndex), # the operations of each thing
+    '_correspondance_index': ('correspondances', lambda correspondance: _correspondance_key(correspondance.provenance, correspondance.operation), AppendIndex),
+    '_system_influence_index': ('influences', lambda influence: (influence.containing.influence_type, _node_key(influence.system)), AppendMultiIndex), # the influences in each system
+    '_influence_of_index': ('influences', lambda influence: (influence.containing.influence_type, _node_key(influence.of)), AppendMultiIndex), # the influences of each thing
+    '_influence_by_index': ('influences', lambda influence: (influence.containing.influence_type, _node_key(influence.by)), AppendMultiIndex), # the influences by each thing
+}
+
+# the influence type of the containing model of each kind of influence, which keys the influence indexes along with the node
+INFLUENCE_TYPES = {
+    GRAPH.ACTIVITY: 'Activity',
+    GRAPH.PASSIVITY: 'Passivity',
+}
+
+# the index giving the ids of each kind of node: the position of its first occurrence in its container
+NODE_INDEXES = {
+    GRAPH.THING: '_thing_index',
+    GRAPH.MATERIAL: '_material_index',
+    GRAPH.SYSTEM: '_system_index',
+}
+
+# the lazily built node id columns of the relationships: the container and end of the relationships, and the kind of node at that end
+# evolveDomain keeps every column which is already built up to date, like the indexes above
+EDGE_COLUMNS = {
+    ('compositions', 'of'): GRAPH.THING,
+    ('compositions', 'by'): GRAPH.THING,
+    ('embodiments', 'of'): GRAPH.THING,
+    ('embodiments', 'by'): GRAPH.MATERIAL,
+    ('provenances', 'of'): GRAPH.THING,
+    ('provenances', 'by'): GRAPH.THING,
+    ('operations', 'of'): GRAPH.THING,
+    ('operations', 'by'): GRAPH.THING,
+    ('influences', 'of'): GRAPH.THING,
+    ('influences', 'by'): GRAPH.THING,
+    ('influences', 'system'): GRAPH.SYSTEM,
+}
+
+
+class Domain(PersistentModel):
+    things: PersistentVector[Thing] = PersistentVector() # the total of things
+    materials: PersistentVector[Material] = PersistentVector() # the total of materials
+    embodiments: PersistentVector[Embodiment] = PersistentVector() # the total thing-material embodiment relationships
+    materialisation: PersistentVector[Thing] = PersistentVector() # the total of things which are embodied
+    compositions: PersistentVector[Composition] = PersistentVector() # the total of thing-thing composition relationships
+    systems: PersistentVector[System] = PersistentVector() # the total of systems
+    provenances: PersistentVector[Provenance] = PersistentVector() # the total of thing-thing influence relationships in systems
+    operations: PersistentVector[Operation] = PersistentVector() # the total of thing-thing influence relationships in systems
+    correspondances: PersistentVector[ProvOpCorrespondance] = PersistentVector() # the total of provenance-operation correspondances
+    influences: PersistentVector[Influence] = PersistentVector() # the total of thing-thing influence relationships in systems
+    activities: PersistentVector[Activity] = PersistentVector()
+    passivities: PersistentVector[Passivity] = PersistentVector()
+
+    # the containers are persistent vectors, so that adding to one of them shares the rest of it with the previous version
+
+    _thing_index: Optional[AppendIndex] = PrivateAttr(default=None)
+    _material_index: Optional[AppendIndex] = PrivateAttr(default=None)
+    _system_index: Optional[AppendIndex] = PrivateAttr(default=None)
+    _child_index: Optional[AppendIndex] = PrivateAttr(default=None)
+    _parent_index: Optional[AppendMultiIndex] = PrivateAttr(default=None)
+    _embodiment_index: Optional[AppendIndex] = PrivateAttr(default=None)
+    _provenance_index: Optional[AppendMultiIndex] = PrivateAttr(default=None)
+    _operation_index: Optional[AppendMultiIndex] = PrivateAttr(default=None)
+    _correspondance_index: Optional[AppendIndex] = PrivateAttr(default=None)
+    _system_influence_index: Optional[AppendMultiIndex] = PrivateAttr(default=None)
+    _influence_of_index: Optional[AppendMultiIndex] = PrivateAttr(default=None)
+    _influence_by_index: Optional[AppendMultiIndex] = PrivateAttr(default=None)
+    _edge_columns: Optional[dict[tuple[str, str], AppendColumn]] = PrivateAttr(default=None)
+    _derived: tuple[int, int] = PrivateAttr(default=(0, 0)) # the count of provenances and operations already joined by deriveCorrespondances
 
     def get_element_container(self, RELATIONSHIPS):
         return getattr(self, RELATIONSHIPS.plural)
 
+    def get_domain_index(self, attribute: str):
+        index = getattr(self, attribute)
+        if index == None:
+            container, key, index_type = DOMAIN_INDEXES[attribute]
+            index = index_type(map(key, getattr(self, container)))
+            setattr(self, attribute, index)
+        return index
+
+    def get_node_id(self, element: GRAPH, node: Union[Thing, Material, System]):
+        # the stable id of the node within the domain, which is the position of its first occurrence in its container
+        node_id = self.get_domain_index(NODE_INDEXES[element]).find(_node_key(node), len(self.get_element_container(element)))
+        return (node_id,) if node_id is not None else ()
+
+    def get_node(self, element: GRAPH, node_id: int):
+        return self.get_element_container(element)[node_id]
+
+    def intern(self, element: GRAPH, node: Union[Thing, Material, System]):
+        # the domain's own object for the node, so that relationships reference it rather than holding copies of it
+        node_id = self.get_node_id(element, node)
+        return self.get_node(element, node_id[0]) if node_id else node
+
+    def get_edge_ids(self, container: str, end: str):
+        # the node ids at one end of the relationships of the container, in their order, with -1 for nodes outside the domain
+        # the ids are the ones of this version, whichever version first built the column
+        if self._edge_columns is None:
+            self._edge_columns = {}
+        column = self._edge_columns.get((container, end))
+        if column is None:
+            element = EDGE_COLUMNS[(container, end)]
+            column = AppendColumn(_node_ids(self, element, (getattr(relationship, end) for relationship in getattr(self, container))))
+            self._edge_columns[(container, end)] = column
+        relationships = getattr(self, container)
+        ids = column.values(len(relationships))
+        missing = column.missing(len(relationships))
+        if missing:
+            # the column is shared with the versions before the nodes added since, so the nodes unknown when it was built
+            # are resolved again in this version, to give the ids a column built from this version would hold
+            element = EDGE_COLUMNS[(container, end)]
+            for position, node_id in zip(missing, _node_ids(self, element, (getattr(relationships[position], end) for position in missing))):
+                ids[position] = node_id
+        return ids
+
+    def has_thing(self, target: Thing):
+        return bool(self.get_node_id(GRAPH.THING, target))
+
+    @instrumented
+    def get_parent(self, target: Thing):
+        # the thing composed by the target, as the tree of compositions allows one at most
+        position = self.get_domain_index('_child_index').find(_node_key(target), len(self.compositions))
+        return (self.compositions[position].of,) if position is not None else ()
+
+    @instrumented
+    def get_path_to_root(self, target: Thing):
+        # the target, then each of its composing things up to the root of its composition tree
+        if not self.has_thing(target):
+            return ()
+        path = (target,)
+        visited = {_node_key(target)}
+        parent = self.get_parent(target)
+        while parent and _node_key(parent[0]) not in visited:
+            # the mutators keep the compositions a tree, the visited things stop the walk on a domain built otherwise
+            path += parent
+            visited.add(_node_key(parent[0]))
+            parent = self.get_parent(parent[0])
+        return path
+
+    @instrumented
+    def get_depth(self, target: Thing):
+        path = self.get_path_to_root(target)
+        return (len(path) - 1,) if path else ()
+
+    @instrumented
     def get_children(self, target: Thing):
+        positions = self.get_domain_index('_parent_index').find_all(_node_key(target), len(self.compositions))
+        return tuple(self.compositions[position].by for position in positions)
 
-        def targetter(composiion, target):
-            if composiion.parent == target:
-                return composiion.child
-        return tuple(map(targetter, self.compositions, repeat(target,)))
-
-    def get_decendents(self, target: Optional[TaxonomicItem] = None):
+    @instrumented
+    def get_decendents(self, target: Optional[Thing] = None):
         if target == None:
-            # Early return to to supply the two simple cases: initial and first tier
-            return self.items
-        return tuple(map(self.get_children, self.items))
-
-
+            # Early return to supply the simple case: every thing of the domain
+            return self.things
+        return tuple(self.iter_decendents(target))
+
+    def iter_decendents(self, target: Thing):
+        # depth first, each thing is yielded before its own decendents
+        # each thing is yielded once, so that a domain built with a cycle of compositions is still traversed to an end
+        visited = {_node_key(target)}
+        stack = [iter(self.get_children(target))]
+        while stack:
+            for child in stack[-1]:
+                if _node_key(child) in visited:
+                    continue
+                visited.add(_node_key(child))
+                yield child
+                stack.append(iter(self.get_children(child)))
+                break
+            else:
+                stack.pop()
+
+    @instrumented
+    def get_subtree_size(self, target: Thing):
+        # the target and all of its decendents
+        if not self.has_thing(target):
+            return 0
+        return 1 + sum(1 for _ in self.iter_decendents(target))
+
+    @instrumented
+    def get_rollup(self, target: Thing, value: Callable[[Thing], float]):
+        # the total of the value over the target and all of its decendents, e.g. the weight of an assembly
+        if not self.has_thing(target):
+            return 0
+        return value(target) + sum(map(value, self.iter_decendents(target)))
+
+    @instrumented
+    def get_embodiment(self, target: Thing):
+        position = self.get_domain_index('_embodiment_index').find(_node_key(target), len(self.embodiments))
+        return (self.embodiments[position].by,) if position is not None else ()
+
+    def _find_influences(self, attribute: str, node: Union[Thing, System], kind: Optional[GRAPH]):
+        # the influences of the kind, or of both kinds, with the node in the indexed role, in the order they were added
+        index = self.get_domain_index(attribute)
+        influence_types = INFLUENCE_TYPES.values() if kind is None else (INFLUENCE_TYPES[kind],)
+        positions = merge(*(index.find_all((influence_type, _node_key(node)), len(self.influences)) for influence_type in influence_types))
+        return tuple(self.influences[position] for position in positions)
+
+    @instrumented
+    def get_system_influences(self, system: System, kind: Optional[GRAPH] = None):
+        return self._find_influences('_system_influence_index', system, kind)
+
+    @instrumented
+    def get_influences_of(self, target: Thing, kind: Optional[GRAPH] = None):
+        return self._find_influences('_influence_of_index', target, kind)
+
+    @instrumented
+    def get_influences_by(self, target: Thing, kind: Optional[GRAPH] = None):
+        return self._find_influences('_influence_by_index', target, kind)
+
+    def transaction(self):
+        # a mutable session of mutations, committed as the next version of the domain, see DomainTransaction
+        return DomainTransaction(self)
+
+    @instrumented
+    def get_bill_of_materials(self, target: Thing):
+        # the materials embodied by the target and its decendents, with the count of things embodying each of them
+        if not self.has_thing(target):
+            return ()
+        counts = {}
+        for thing in (target, *self.iter_decendents(target)):
+            for material in self.get_embodiment(thing):
+                material_key = _node_key(material)
+                counts[material_key] = (material, counts[material_key][1] + 1) if material_key in counts else (material, 1)
+        return tuple(counts.values())
+
+
+def _parent_key(domain: Domain, key: str):
+    # the name of the thing composed by the thing of the name, None for the root of a composition tree
+    position = domain.get_domain_index('_child_index').find(key, len(domain.compositions))
+    return _node_key(domain.compositions[position].of) if position is not None else None
+
+
+def _node_ids(domain: Domain, element: GRAPH, nodes: Iterable[Union[Thing, Material, System]]):
+    index = domain.get_domain_index(NODE_INDEXES[element])
+    length = len(domain.get_element_container(element))
+    for node in nodes:
+        node_id = index.find(_node_key(node), length)
+        yield node_id if node_id is not None else -1
+
+
+@instrumented
 def newDomain():
     return Domain(
         things = (),
@@ -203,7 +457,7 @@ def newDomain():
         systems = (),
         provenances = (),
         operations = (),
-        correspondences = (),
+        correspondances = (),
         influences = (),
         activities = (),
         passivities = (),
@@ -221,176 +475,509 @@ def createNode(node: NODES, name: str):
             return System(name=name)
 
 
+RELATIONSHIP_MODELS = {
+    GRAPH.COMPOSITION: Composition,
+    GRAPH.EMBODIMENT: Embodiment,
+    GRAPH.PROVENANCE: Provenance,
+    GRAPH.OPERATION: Operation,
+}
+
+
+@instrumented
+def evolveDomain(domain: Domain, **containers):
+    # the next version of the domain, sharing every container which is not replaced with the previous version
+    # the replacing containers must extend the ones they replace, as every domain mutation appends
+    evolved = trusted(Domain, **(dict(domain) | containers))
+    for attribute, (container, key, _) in DOMAIN_INDEXES.items():
+        index = getattr(domain, attribute)
+        if index != None and container in containers:
+            length = len(getattr(domain, container))
+            index = index.extended(length, map(key, containers[container][length:]))
+        setattr(evolved, attribute, index)
+    evolved._derived = domain._derived
+    if domain._edge_columns is not None:
+        evolved._edge_columns = {}
+        for (container, end), column in domain._edge_columns.items():
+            if container in containers:
+                length = len(getattr(domain, container))
+                relationships = containers[container][length:]
+                column = column.extended(length, _node_ids(evolved, EDGE_COLUMNS[(container, end)], (getattr(relationship, end) for relationship in relationships)))
+            evolved._edge_columns[(container, end)] = column
+    return evolved
+
+
+def _interned(domain: Union[Domain, 'DomainTransaction'], relationship: BaseModel, **ends: GRAPH):
+    # the validated relationship, pointing its ends at the domain's own node objects rather than at copies of them
+    return relationship.copy(update = {end: domain.intern(element, getattr(relationship, end)) for end, element in ends.items()})
+
+
+@instrumented
 def addNode(domain: Domain, element: GRAPH, name: str):
     if element in NODES:
-        plurals = GRAPH.pluralsTuple()
-        domain_dump = domain.dict(exclude={element.plural})
-        nodes_dump = domain.dict(include={element.plural})
         node = createNode(node = element, name = name)
-        new_things = nodes_dump[element.plural] + (node,)
-        data_dict = domain_dump | {element.plural: new_things}
-        return Domain(**data_dict)
+        return evolveDomain(domain, **{element.plural: domain.get_element_container(element).appended(node)})
     else:
         return domain
 
 
+@instrumented
 def addThing(domain: Domain, name: str):
     return addNode(domain = domain, element = GRAPH.THING, name = name)
 
 
+@instrumented
 def addMaterial(domain: Domain, name: str):
     return addNode(domain = domain, element = GRAPH.MATERIAL, name = name)
 
 
+@instrumented
 def addSystem(domain: Domain, name: str):
     return addNode(domain = domain, element = GRAPH.SYSTEM, name = name)
 
 
+@instrumented
 def addProvenance(domain: Domain, of: Thing, by: Thing):
-    return Domain(
-        things = domain.things, 
-        materials = domain.materials,
-        embodiments = domain.embodiments,
-        materialisation = domain.materialisation,
-        compositions = domain.compositions,
-        provenances = domain.provenances + (Provenance(
+    return evolveDomain(domain,
+        provenances = domain.provenances.appended(_interned(domain, Provenance(
             of = of,
             by = by,
-        ),),
-        operations = domain.operations,
-        correspondences = domain.correspondances, 
-        systems = domain.systems,
-        influences = domain.influences,
-        activities = domain.activities,
-        passivities = domain.passivities,
-        )
+        ), of = GRAPH.THING, by = GRAPH.THING)),
+    )
 
 
+@instrumented
 def addOperation(domain: Domain, of: Thing, by: Thing):
-    return Domain(
-        things = domain.things, 
-        materials = domain.materials,
-        embodiments = domain.embodiments,
-        materialisation = domain.materialisation,
-        compositions = domain.compositions,
-        provenances = domain.provenances,
-        operations = domain.operations + (Operation(
+    return evolveDomain(domain,
+        operations = domain.operations.appended(_interned(domain, Operation(
             of = of,
             by = by,
-        ),),
-        correspondences = domain.correspondances, 
-        systems = domain.systems,
-        influences = domain.influences,
-        activities = domain.activities,
-        passivities = domain.passivities,
-        )
+        ), of = GRAPH.THING, by = GRAPH.THING)),
+    )
 
 
+@instrumented
 def addPassiveInfluence(domain: Domain, system: System, of: Thing, by: Thing):
-    return Domain(
-        things = domain.things, 
-        materials = domain.materials,
-        embodiments = domain.embodiments,
-        materialisation = domain.materialisation,
-        compositions = domain.compositions,
-        systems = domain.systems, 
-        provenances = domain.provenances,
-        operations = domain.operations,
-        correspondences = domain.correspondances, 
-        influences = domain.influences + (Influence(
-            system = system,
-            containing = Passivity(
-                influence_type = "Passivity",
-                of = of,
-                by = by,
-            )
-        ),),
-        activities = domain.activities,
-        passivities = domain.passivities,
+    influence = Influence(
+        system = system,
+        containing = Passivity(
+            influence_type = "Passivity",
+            of = of,
+            by = by,
+        )
+    )
+    return evolveDomain(domain,
+        influences = domain.influences.appended(influence.copy(update = {
+            'system': domain.intern(GRAPH.SYSTEM, influence.system),
+            'containing': _interned(domain, influence.containing, of = GRAPH.THING, by = GRAPH.THING),
+        })),
     )
 
 
+@instrumented
 def addActiveInfluence(domain: Domain, system: System, of: Thing, by: Thing, operations: list[Operation]):
-    return Domain(
-        things = domain.things, 
-        materials = domain.materials,
-        embodiments = domain.embodiments,
-        materialisation = domain.materialisation,
-        compositions = domain.compositions,
-        systems = domain.systems, 
-        provenances = domain.provenances,
-        operations = domain.operations,
-        correspondences = domain.correspondances, 
-        influences = domain.influences + (Influence(
-            system = system,
-            containing = Activity(
-                influence_type = "Activity",
-                of = of,
-                by = by,
-                operations = operations
-            )
-        ),),
-        activities = domain.activities,
-        passivities = domain.passivities,
+    influence = Influence(
+        system = system,
+        containing = Activity(
+            influence_type = "Activity",
+            of = of,
+            by = by,
+            operations = operations
+        )
+    )
+    return evolveDomain(domain,
+        influences = domain.influences.appended(influence.copy(update = {
+            'system': domain.intern(GRAPH.SYSTEM, influence.system),
+            'containing': _interned(domain, influence.containing, of = GRAPH.THING, by = GRAPH.THING),
+        })),
     )
 
 
+@instrumented
 def composeThing(domain: Domain, of: Thing, by: Thing):
     # early returns
-    if not of in domain.things:
+    of_id = domain.get_node_id(GRAPH.THING, of)
+    if not of_id:
         # stop a composition across domains
         return domain
-    if not by in domain.things:
+    by_id = domain.get_node_id(GRAPH.THING, by)
+    if not by_id:
         # stop a composition across domains
         return domain
-    if of == by:
+    if of_id == by_id:
         # stop self-composition
         return domain
-    for c in domain.compositions: # expensive loop: consider a tuple of parents
-        if by == c.by:
-            # enforce a tree by stopping many-parents of things
-            return domain
-    return Domain(
-        things = domain.things, 
-        materials = domain.materials,
-        embodiments = domain.embodiments,
-        materialisation = domain.materialisation,
-        compositions = domain.compositions + (Composition(
-            of = of,
-            by = by,
-            ),),
-        systems = domain.systems, 
-        provenances = domain.provenances,
-        operations = domain.operations,
-        correspondences = domain.correspondances, 
-        influences = domain.influences,
-        activities = domain.activities,
-        passivities = domain.passivities,
+    if domain.get_parent(by):
+        # enforce a tree by stopping many-parents of things
+        return domain
+    if any(_node_key(ancestor) == _node_key(by) for ancestor in domain.get_path_to_root(of)):
+        # enforce a tree by stopping cycles, which a thing composing one of its own ancestors would close
+        return domain
+    return evolveDomain(domain,
+        compositions = domain.compositions.appended(trusted(Composition,
+            of = domain.get_node(GRAPH.THING, of_id[0]),
+            by = domain.get_node(GRAPH.THING, by_id[0]),
+            )),
     )
 
 
+@instrumented
 def embodyThing(domain: Domain, of: Thing, by: Material):
-    if of in domain.materialisation:
+    if domain.get_embodiment(of):
+        # a thing is embodied by one material at most
         return domain
-    if not of in domain.things:
+    of_id = domain.get_node_id(GRAPH.THING, of)
+    if not of_id:
         return domain
-    if not by in domain.materials:
+    by_id = domain.get_node_id(GRAPH.MATERIAL, by)
+    if not by_id:
         return domain
-    return Domain(
-        things = domain.things,
-        materials = domain.materials,
-        embodiments = domain.embodiments + (Embodiment(
+    of = domain.get_node(GRAPH.THING, of_id[0])
+    return evolveDomain(domain,
+        embodiments = domain.embodiments.appended(trusted(Embodiment,
             of = of,
-            by = by
-            ),),
-        materialisation = domain.materialisation + (by,),
-        compositions = domain.compositions,
-        correspondences = domain.correspondances,
-        provenances = domain.provenances,
-        operations = domain.operations,
-        systems = domain.systems,
-        influences = domain.influences,
-        activities = domain.activities,
-        passivities = domain.passivities,
-        )
-    
+            by = domain.get_node(GRAPH.MATERIAL, by_id[0]),
+            )),
+        materialisation = domain.materialisation.appended(of),
+    )
+
+
+@instrumented
+def buildDomain(
+    things: Iterable[str] = (),
+    materials: Iterable[str] = (),
+    systems: Iterable[str] = (),
+    compositions: Iterable[tuple[str, str]] = (),
+    embodiments: Iterable[tuple[str, str]] = (),
+    provenances: Iterable[tuple[str, str]] = (),
+    operations: Iterable[tuple[str, str]] = (),
+    correspondances: Iterable[tuple[tuple[str, str], tuple[str, str]]] = (),
+    passivities: Iterable[tuple[str, str, str]] = (),
+    activities: Iterable[tuple[str, str, str, Iterable[tuple[str, str]]]] = (),
+    domain: Optional[Domain] = None,
+):
+    """
+    Loads nodes and relationships in bulk, into a new domain or on top of the given one.
+
+    Nodes are given by name, and relationships reference them by name: (of, by) for compositions, embodiments, provenances and operations,
+    ((provenance of, by), (operation of, by)) for correspondances, (system, of, by) for passivities,
+    and (system, of, by, ((operation of, by), ...)) for activities, any of these tuples being given as a list too, as json gives them.
+    Every row is checked once, in the order above, with the rules of the single element mutators,
+    and a relationship may reference the nodes and relationships loaded before it in the same call.
+    Returns the domain, and the rejected rows as (element, row, REJECTION) triples.
+    """
+    domain = domain if domain is not None else newDomain()
+    rejected = []
+    added = {element.plural: [] for element in GRAPH}
+    # rows are checked against the domain through its indexes, and against the rows loaded before them through these dicts
+    # so that a call costs the rows it is given, however large the domain is
+    nodes = {element: {} for element in NODE_INDEXES} # the nodes loaded by this call, by name
+    relationships = {GRAPH.PROVENANCE: {}, GRAPH.OPERATION: {}} # the provenances and operations loaded by this call, by (of, by)
+    parents = {} # the composing thing of the compositions loaded by this call
+    embodied = set() # the things embodied by this call
+
+    def find_node(element: GRAPH, name: str):
+        # the node of the name, loaded by this call or already part of the domain, None otherwise
+        node = nodes[element].get(name)
+        if node is None:
+            node_id = domain.get_domain_index(NODE_INDEXES[element]).find(name, len(domain.get_element_container(element)))
+            if node_id is not None:
+                node = domain.get_node(element, node_id)
+        return node
+
+    def find_relationship(element: GRAPH, pair: tuple[str, str]):
+        # the provenance or operation of the (of, by) pair, loaded by this call or already part of the domain, None otherwise
+        relationship = relationships[element].get(pair)
+        if relationship is None:
+            # the domain indexes provenances by their by-thing, and operations by their of-thing
+            attribute, end = ('_provenance_index', 1) if element == GRAPH.PROVENANCE else ('_operation_index', 0)
+            container = domain.get_element_container(element)
+            for position in domain.get_domain_index(attribute).find_all(pair[end], len(container)):
+                if (_node_key(container[position].of), _node_key(container[position].by)) == pair:
+                    return container[position]
+        return relationship
+
+    def load_nodes(element: GRAPH, names: Iterable[str]):
+        for name in names:
+            if find_node(element, name) is not None:
+                rejected.append((element, name, REJECTION.DUPLICATE_NODE))
+                continue
+            node = nodes[element][name] = createNode(node = element, name = name)
+            added[element.plural].append(node)
+
+    load_nodes(GRAPH.THING, things)
+    load_nodes(GRAPH.MATERIAL, materials)
+    load_nodes(GRAPH.SYSTEM, systems)
+
+    def load_pairs(element: GRAPH, rows: Iterable[tuple[str, str]], by_element: GRAPH, check: Callable):
+        # loads (of, by) rows which pass the check
+        for row in rows:
+            row = tuple(row)
+            of, by = row
+            of_node, by_node = find_node(GRAPH.THING, of), find_node(by_element, by)
+            if of_node is None or by_node is None:
+                rejected.append((element, row, REJECTION.UNKNOWN_NODE))
+                continue
+            reason = check(of, by)
+            if reason != None:
+                rejected.append((element, row, reason))
+                continue
+            relationship = trusted(RELATIONSHIP_MODELS[element], of = of_node, by = by_node)
+            if element in relationships:
+                relationships[element][row] = relationship
+            added[element.plural].append(relationship)
+
+    def check_composition(of: str, by: str):
+        if of == by:
+            return REJECTION.SELF_LOOP
+        if by in parents or _parent_key(domain, by) is not None:
+            return REJECTION.MANY_PARENTS
+        ancestor = of
+        while ancestor is not None:
+            if ancestor == by:
+                return REJECTION.CYCLE
+            ancestor = parents[ancestor] if ancestor in parents else _parent_key(domain, ancestor)
+        parents[by] = of
+
+    def check_embodiment(of: str, by: str):
+        if of in embodied or domain.get_domain_index('_embodiment_index').find(of, len(domain.embodiments)) is not None:
+            return REJECTION.EMBODIED
+        embodied.add(of)
+
+    def check_act(of: str, by: str):
+        if of == by:
+            return REJECTION.SELF_LOOP
+
+    load_pairs(GRAPH.COMPOSITION, compositions, GRAPH.THING, check_composition)
+    load_pairs(GRAPH.EMBODIMENT, embodiments, GRAPH.MATERIAL, check_embodiment)
+    load_pairs(GRAPH.PROVENANCE, provenances, GRAPH.THING, check_act)
+    load_pairs(GRAPH.OPERATION, operations, GRAPH.THING, check_act)
+
+    for row in correspondances:
+        row = tuple(map(tuple, row))
+        provenance, operation = row
+        provenance_relationship = find_relationship(GRAPH.PROVENANCE, provenance)
+        operation_relationship = find_relationship(GRAPH.OPERATION, operation)
+        if provenance_relationship is None or operation_relationship is None:
+            rejected.append((GRAPH.CORRESPONDANCE, row, REJECTION.UNKNOWN_RELATIONSHIP))
+        elif provenance[1] != operation[0]:
+            rejected.append((GRAPH.CORRESPONDANCE, row, REJECTION.MISMATCH))
+        else:
+            added[GRAPH.CORRESPONDANCE.plural].append(trusted(ProvOpCorrespondance,
+                provenance = provenance_relationship,
+                operation = operation_relationship,
+            ))
+
+    for element, rows in ((GRAPH.PASSIVITY, passivities), (GRAPH.ACTIVITY, activities)):
+        for row in rows:
+            row = tuple(row[:3]) + ((tuple(map(tuple, row[3])),) if element == GRAPH.ACTIVITY else ())
+            system, of, by = row[:3]
+            system_node, of_node, by_node = find_node(GRAPH.SYSTEM, system), find_node(GRAPH.THING, of), find_node(GRAPH.THING, by)
+            if system_node is None or of_node is None or by_node is None:
+                rejected.append((element, row, REJECTION.UNKNOWN_NODE))
+                continue
+            if element == GRAPH.PASSIVITY:
+                containing = trusted(Passivity, influence_type = "Passivity", of = of_node, by = by_node)
+            else:
+                operation_keys = row[3]
+                operation_relationships = tuple(find_relationship(GRAPH.OPERATION, operation) for operation in operation_keys)
+                if any(relationship is None for relationship in operation_relationships):
+                    rejected.append((element, row, REJECTION.UNKNOWN_RELATIONSHIP))
+                    continue
+                if any(operation[0] != of for operation in operation_keys):
+                    rejected.append((element, row, REJECTION.MISMATCH))
+                    continue
+                containing = trusted(Activity,
+                    influence_type = "Activity",
+                    of = of_node,
+                    by = by_node,
+                    operations = list(operation_relationships),
+                )
+            added[GRAPH.INFLUENCE.plural].append(trusted(Influence, system = system_node, containing = containing))
+
+    containers = {
+        element.plural: domain.get_element_container(element).extended(added[element.plural])
+        for element in GRAPH if added[element.plural]
+    }
+    if added[GRAPH.EMBODIMENT.plural]:
+        containers['materialisation'] = domain.materialisation.extended(embodiment.of for embodiment in added[GRAPH.EMBODIMENT.plural])
+    return evolveDomain(domain, **containers) if containers else domain, tuple(rejected)
+
+
+@instrumented
+def deriveCorrespondances(domain: Domain):
+    """
+    Adds a correspondance for every provenance and operation sharing a thing, as the provenance by-thing and the operation of-thing.
+
+    Provenances and operations are hash joined through indexes on that thing, and the domain remembers how far it has joined them,
+    so deriving again after adding to the domain only joins the new provenances and operations.
+    A pair which already has a correspondance is not added twice.
+    """
+    provenance_index = domain.get_domain_index('_provenance_index')
+    operation_index = domain.get_domain_index('_operation_index')
+    correspondance_index = domain.get_domain_index('_correspondance_index')
+    joined_provenances, joined_operations = domain._derived
+    provenances_length, operations_length = len(domain.provenances), len(domain.operations)
+
+    # the new provenances with every operation, then the new operations with the provenances already joined
+    pairs = [
+        (position, operation_position)
+        for position in range(joined_provenances, provenances_length)
+        for operation_position in operation_index.find_all(_node_key(domain.provenances[position].by), operations_length)
+    ]
+    pairs += [
+        (provenance_position, position)
+        for position in range(joined_operations, operations_length)
+        for provenance_position in provenance_index.find_all(_node_key(domain.operations[position].of), joined_provenances)
+    ]
+
+    added = []
+    keys = set()
+    for provenance_position, operation_position in pairs:
+        provenance, operation = domain.provenances[provenance_position], domain.operations[operation_position]
+        key = _correspondance_key(provenance, operation)
+        if key in keys or correspondance_index.find(key, len(domain.correspondances)) is not None:
+            continue
+        keys.add(key)
+        added.append(trusted(ProvOpCorrespondance, provenance = provenance, operation = operation))
+
+    if not added and domain._derived == (provenances_length, operations_length):
+        # Early return as neither the domain nor the join has moved on
+        return domain
+    # a new version, sharing every container when nothing is added, so that the domain given is left as it was
+    evolved = evolveDomain(domain, correspondances = domain.correspondances.extended(added)) if added else evolveDomain(domain)
+    evolved._derived = (provenances_length, operations_length)
+    return evolved
+
+
+class DomainTransaction:
+    """
+    A mutable session over a domain, which applies the rules of the mutators to buffers, and commits them as a single new version.
+
+    Used as a context manager, it commits when the block ends, or rolls back if the block raises, leaving the domain as it was.
+    The mutations refused by the early return guards of the mutators are logged in rejected, as (element, arguments, REJECTION).
+    """
+
+    def __init__(self, domain: Domain):
+        self.domain = domain # the version the transaction builds on
+        self.result: Optional[Domain] = None # the committed version
+        self.rollback()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exception_type, exception, traceback):
+        if exception_type is not None:
+            self.rollback()
+        elif self.result is None:
+            self.commit()
+        return False
+
+    def rollback(self):
+        # discards every buffered mutation, and the rejections logged along with them, the transaction stays open
+        self.rejected: list[tuple[GRAPH, tuple, REJECTION]] = []
+        self._added = {container: [] for container in (*GRAPH.pluralsTuple(), 'materialisation')}
+        self._nodes = {element: {} for element in NODE_INDEXES} # the nodes added by the transaction, by name
+        self._parents: dict[str, str] = {} # the composing thing of the compositions added by the transaction
+        self._embodied: set[str] = set() # the things embodied by the transaction
+
+    @instrumented
+    def commit(self):
+        if self.result is not None:
+            raise RuntimeError('The transaction is already committed')
+        containers = {
+            container: getattr(self.domain, container).extended(added)
+            for container, added in self._added.items() if added
+        }
+        self.result = evolveDomain(self.domain, **containers) if containers else self.domain
+        return self.result
+
+    def _append(self, container: str, element: BaseModel):
+        if self.result is not None:
+            raise RuntimeError('The transaction is already committed')
+        self._added[container].append(element)
+        return element
+
+    def _reject(self, element: GRAPH, arguments: tuple, reason: REJECTION):
+        self.rejected.append((element, arguments, reason))
+        return None
+
+    def intern(self, element: GRAPH, node: Union[Thing, Material, System]):
+        # the object of the node in the domain, or in the transaction, so that relationships reference it rather than copies
+        node_id = self.domain.get_node_id(element, node)
+        if node_id:
+            return self.domain.get_node(element, node_id[0])
+        return self._nodes[element].get(_node_key(node), node)
+
+    def _has_node(self, element: GRAPH, node: Union[Thing, Material, System]):
+        return bool(self.domain.get_node_id(element, node)) or _node_key(node) in self._nodes[element]
+
+    def addNode(self, element: GRAPH, name: str):
+        if element not in NODES:
+            return None
+        node = self._append(element.plural, createNode(node = element, name = name))
+        if not self.domain.get_node_id(element, node):
+            self._nodes[element].setdefault(name, node)
+        return node
+
+    def addThing(self, name: str):
+        return self.addNode(element = GRAPH.THING, name = name)
+
+    def addMaterial(self, name: str):
+        return self.addNode(element = GRAPH.MATERIAL, name = name)
+
+    def addSystem(self, name: str):
+        return self.addNode(element = GRAPH.SYSTEM, name = name)
+
+    def addProvenance(self, of: Thing, by: Thing):
+        return self._append('provenances', _interned(self, Provenance(of = of, by = by), of = GRAPH.THING, by = GRAPH.THING))
+
+    def addOperation(self, of: Thing, by: Thing):
+        return self._append('operations', _interned(self, Operation(of = of, by = by), of = GRAPH.THING, by = GRAPH.THING))
+
+    def _add_influence(self, influence: Influence):
+        return self._append('influences', influence.copy(update = {
+            'system': self.intern(GRAPH.SYSTEM, influence.system),
+            'containing': _interned(self, influence.containing, of = GRAPH.THING, by = GRAPH.THING),
+        }))
+
+    def addPassiveInfluence(self, system: System, of: Thing, by: Thing):
+        return self._add_influence(Influence(
+            system = system,
+            containing = Passivity(influence_type = "Passivity", of = of, by = by),
+        ))
+
+    def addActiveInfluence(self, system: System, of: Thing, by: Thing, operations: list[Operation]):
+        return self._add_influence(Influence(
+            system = system,
+            containing = Activity(influence_type = "Activity", of = of, by = by, operations = operations),
+        ))
+
+    def composeThing(self, of: Thing, by: Thing):
+        # early returns, as in composeThing
+        if not self._has_node(GRAPH.THING, of) or not self._has_node(GRAPH.THING, by):
+            return self._reject(GRAPH.COMPOSITION, (of, by), REJECTION.UNKNOWN_NODE)
+        if _node_key(of) == _node_key(by):
+            return self._reject(GRAPH.COMPOSITION, (of, by), REJECTION.SELF_LOOP)
+        if _node_key(by) in self._parents or self.domain.get_parent(by):
+            return self._reject(GRAPH.COMPOSITION, (of, by), REJECTION.MANY_PARENTS)
+        ancestor = _node_key(of)
+        while ancestor is not None:
+            if ancestor == _node_key(by):
+                return self._reject(GRAPH.COMPOSITION, (of, by), REJECTION.CYCLE)
+            ancestor = self._parents[ancestor] if ancestor in self._parents else _parent_key(self.domain, ancestor)
+        self._parents[_node_key(by)] = _node_key(of)
+        return self._append('compositions', trusted(Composition,
+            of = self.intern(GRAPH.THING, of),
+            by = self.intern(GRAPH.THING, by),
+        ))
+
+    def embodyThing(self, of: Thing, by: Material):
+        # early returns, as in embodyThing
+        if _node_key(of) in self._embodied or self.domain.get_embodiment(of):
+            return self._reject(GRAPH.EMBODIMENT, (of, by), REJECTION.EMBODIED)
+        if not self._has_node(GRAPH.THING, of) or not self._has_node(GRAPH.MATERIAL, by):
+            return self._reject(GRAPH.EMBODIMENT, (of, by), REJECTION.UNKNOWN_NODE)
+        self._embodied.add(_node_key(of))
+        of = self.intern(GRAPH.THING, of)
+        self._append('materialisation', of)
+        return self._append('embodiments', trusted(Embodiment, of = of, by = self.intern(GRAPH.MATERIAL, by)))
@@ -0,0 +1,133 @@
+"""
+The version history of a domain or a taxonomy, as a log of the operations applied to it, with periodic checkpoints.
+
+Every mutation of a domain or a taxonomy appends to its containers, so a version is described by the lengths of its containers,
+and what a later version added is the slice of the latest containers between the two lengths.
+The history holds a few ints per version and the operations with their arguments, so it grows with the number of changes.
+A taxonomy version is the prefix of the latest taxonomy of its lengths, while a domain version is rebuilt by replaying the log
+from the checkpoint before it, a version kept every checkpoint_interval operations, which shares its containers with the latest version.
+"""
+from bisect import bisect_left
+from functools import lru_cache
+from inspect import signature
+from typing import Any, Callable, Union
+
+from .validation import trusted
+from .taxonomy import Taxonomy
+from .composition import Domain
+
+
+Model = Union[Domain, Taxonomy]
+
+# the append-only containers of each model, which describe its versions and their differences
+HISTORY_CONTAINERS = {
+    Domain: tuple(Domain.__fields__),
+    Taxonomy: ('items', 'first_tier_binds', 'subsequent_tier_binds'),
+}
+
+
+def _taxonomy_prefix(taxonomy: Taxonomy, lengths: tuple[int, ...]):
+    # the version of the taxonomy of the given container lengths, as items, tiers and binds are appended to,
+    # and the children of each item are appended in the order of their positions
+    items_length, first_tier_length, subsequent_tiers_length = lengths
+    return trusted(Taxonomy,
+        taxonomy_head = taxonomy.taxonomy_head,
+        items = taxonomy.items[:items_length],
+        first_tier = taxonomy.first_tier[:first_tier_length],
+        first_tier_binds = taxonomy.first_tier_binds[:first_tier_length],
+        subsequent_tiers = taxonomy.subsequent_tiers[:subsequent_tiers_length],
+        subsequent_tier_binds = taxonomy.subsequent_tier_binds[:subsequent_tiers_length],
+        children_map = tuple(children[:bisect_left(children, items_length)] for children in taxonomy.children_map[:items_length]),
+    )
+
+
+# the keyword naming the model in the operations which take it after their other arguments, as buildDomain takes domain
+MODEL_KEYWORDS = {
+    Domain: 'domain',
+    Taxonomy: 'taxonomy',
+}
+
+
+@lru_cache(maxsize = None)
+def _takes_model_keyword(operation: Callable[..., Any], keyword: str):
+    # whether the operation takes the model as the keyword, rather than as its first argument like addThing does
+    parameters = list(signature(operation).parameters)
+    return bool(parameters) and parameters[0] != keyword and keyword in parameters
+
+
+# the models whose versions are rebuilt from the latest one and their lengths, rather than replayed from checkpoints
+PREFIX_VERSIONS: dict[type, Callable[[Any, tuple[int, ...]], Any]] = {
+    Taxonomy: _taxonomy_prefix,
+}
+
+
+class History:
+    """
+    The versions of a domain or a taxonomy built by the operations applied through the history, numbered from 0 for the initial one.
+
+    The checkpoint interval only applies to domains, taxonomy versions being prefixes of the latest one.
+    """
+
+    def __init__(self, initial: Model, checkpoint_interval: int = 100):
+        self.latest = initial
+        self.checkpoint_interval = checkpoint_interval
+        self._containers = HISTORY_CONTAINERS[type(initial)]
+        self._keyword = MODEL_KEYWORDS[type(initial)]
+        self._log: list[tuple[Callable[..., Any], tuple, dict]] = [] # the operation building each version from the previous one
+        self._lengths: list[tuple[int, ...]] = [self._measure(initial)] # the container lengths of each version
+        self._prefix = PREFIX_VERSIONS.get(type(initial))
+        self._checkpoints: dict[int, Model] = {0: initial} if self._prefix is None else {}
+
+    def __len__(self):
+        return len(self._lengths)
+
+    def _measure(self, model: Model):
+        return tuple(len(getattr(model, container)) for container in self._containers)
+
+    def _call(self, operation: Callable[..., Any], model: Model, args: tuple, kwargs: dict):
+        # returns the new version, and what the operation returns
+        # operations returning a tuple give the new version first, as buildDomain does
+        if _takes_model_keyword(operation, self._keyword):
+            result = operation(*args, **kwargs, **{self._keyword: model})
+        else:
+            result = operation(model, *args, **kwargs)
+        return (result[0] if isinstance(result, tuple) else result), result
+
+    def apply(self, operation: Callable[..., Any], *args, **kwargs):
+        # applies the operation to the latest version and returns what it returns, the operation taking the model first,
+        # e.g. history.apply(addThing, "truck"), or as its domain or taxonomy keyword, e.g. history.apply(buildDomain, things = ...)
+        self.latest, result = self._call(operation, self.latest, args, kwargs)
+        self._log.append((operation, args, kwargs))
+        self._lengths.append(self._measure(self.latest))
+        if self._prefix is None and len(self._log) % self.checkpoint_interval == 0:
+            self._checkpoints[len(self._log)] = self.latest
+        return result
+
+    def version(self, number: int):
+        if not 0 <= number < len(self):
+            raise IndexError('There is no version of that number in the history')
+        if number == len(self) - 1:
+            return self.latest
+        if self._prefix is not None:
+            return self._prefix(self.latest, self._lengths[number])
+        start = number - number % self.checkpoint_interval
+        model = self._checkpoints[start]
+        for operation, args, kwargs in self._log[start:number]:
+            model, _ = self._call(operation, model, args, kwargs)
+        return model
+
+    def diff(self, first: int, second: int):
+        """
+        The elements of each container added from the first version to the second, and removed going back from it.
+
+        Both are dicts of the containers which changed, to the tuple of their elements, read from the latest version.
+        """
+        for number in (first, second):
+            if not 0 <= number < len(self):
+                raise IndexError('There is no version of that number in the history')
+        changes = {}
+        for container, first_length, second_length in zip(self._containers, self._lengths[first], self._lengths[second]):
+            start, end = sorted((first_length, second_length))
+            if start != end:
+                changes[container] = tuple(getattr(self.latest, container)[start:end])
+        return (changes, {}) if first <= second else ({}, changes)
@@ -0,0 +1,100 @@
+"""
+Opt-in counters and timers for the public helpers and the root validators of taxonomy.py and composition.py.
+
+The instrumented functions record their calls, wall time and the container sizes of the model they are called on
+into the active Instrumentation, set with set_instrumentation or the instrumenting context manager.
+While none is active an instrumented function costs a single check on top of the call it wraps.
+The recorded time is inclusive, so a helper calling another one counts the time of both, and the validators
+show how much of it went to validation.
+"""
+from collections.abc import Sized
+from contextlib import contextmanager
+from functools import wraps
+from time import perf_counter
+from typing import Any, Callable, Optional, TypeVar
+from pydantic import BaseModel
+
+
+Function = TypeVar('Function', bound=Callable[..., Any])
+
+
+class Instrumentation:
+    """
+    The calls, wall time and container sizes recorded for each instrumented function, by qualified name.
+    """
+
+    def __init__(self):
+        self.calls: dict[str, int] = {}
+        self.seconds: dict[str, float] = {}
+        self.sizes: dict[str, dict[str, int]] = {} # the container sizes of the model of the latest call
+        self.max_sizes: dict[str, dict[str, int]] = {} # the largest container sizes seen over the calls
+
+    def record(self, name: str, seconds: float, sizes: Optional[dict[str, int]] = None):
+        self.calls[name] = self.calls.get(name, 0) + 1
+        self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+        if sizes:
+            self.sizes[name] = sizes
+            max_sizes = self.max_sizes.setdefault(name, {})
+            for container, size in sizes.items():
+                if size > max_sizes.get(container, -1):
+                    max_sizes[container] = size
+
+    def reset(self):
+        self.__init__()
+
+    def as_dict(self):
+        return {
+            name: {
+                'calls': calls,
+                'seconds': self.seconds[name],
+                'sizes': dict(self.sizes.get(name, {})),
+                'max_sizes': dict(self.max_sizes.get(name, {})),
+            }
+            for name, calls in self.calls.items()
+        }
+
+
+# instrumentation is off while it is None
+_instrumentation: Optional[Instrumentation] = None
+
+
+def set_instrumentation(instrumentation: Optional[Instrumentation]):
+    global _instrumentation
+    previous = _instrumentation
+    _instrumentation = instrumentation
+    return previous
+
+
+@contextmanager
+def instrumenting(instrumentation: Optional[Instrumentation] = None):
+    instrumentation = instrumentation if instrumentation is not None else Instrumentation()
+    previous = set_instrumentation(instrumentation)
+    try:
+        yield instrumentation
+    finally:
+        set_instrumentation(previous)
+
+
+def container_sizes(model: Any):
+    # the length of every container field of a model, none for anything else
+    if not isinstance(model, BaseModel):
+        return None
+    return {field: len(value) for field, value in model.__dict__.items() if isinstance(value, Sized) and not isinstance(value, str)}
+
+
+def instrumented(function: Function) -> Function:
+    name = function.__qualname__
+
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        instrumentation = _instrumentation
+        if instrumentation is None:
+            return function(*args, **kwargs)
+        start = perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            # the model is the first argument of the helpers and methods, and is passed as domain or taxonomy otherwise
+            model = args[0] if args else kwargs.get('domain', kwargs.get('taxonomy'))
+            instrumentation.record(name, perf_counter() - start, container_sizes(model))
+    return wrapper
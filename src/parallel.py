@@ -0,0 +1,93 @@
+"""
+Parallel classification of large sets of instances, for rules which are too costly to run on a single core.
+
+The rule picks the taxonomic item of each instance, or None to leave it unclassified, and is run on a process pool
+over chunks of the instances. Each worker receives the rule and the taxonomy once, as the columns of a CompactTaxonomy,
+and answers each chunk with the taxonomy index of the item picked for each instance.
+The classifier is then built in the calling process by classify_many over the chunks in input order,
+so the result is the one a single process would build: an exclusive classifier keeps the first classification
+of an instance and rejects the later ones, whatever the number of workers.
+"""
+import multiprocessing
+import os
+from typing import Any, Callable, Iterable, Optional, Type, Union
+
+from .taxonomy import Taxonomy, CompactTaxonomy, TaxonomicItem, BaseClassifier
+from .records import chunked
+
+
+Rule = Callable[[Any], Optional[TaxonomicItem]]
+# the taxonomy index of the item picked for an instance, the item itself when it is not part of the taxonomy,
+# or None when the rule picked nothing
+Decision = Union[int, TaxonomicItem, None]
+
+# the rule and taxonomy of a worker process, set by its pool initializer
+_worker_rule: Optional[Rule] = None
+_worker_taxonomy: Optional[CompactTaxonomy] = None
+
+
+def _decide(taxonomy: CompactTaxonomy, rule: Rule, chunk: Iterable[Any]) -> list[Decision]:
+    decisions = []
+    for instance in chunk:
+        item = rule(instance)
+        if item is None:
+            decisions.append(None)
+            continue
+        index = taxonomy.get_index(item)
+        decisions.append(index[0] if index else item)
+    return decisions
+
+
+def _initialize_worker(rule: Rule, columns: tuple):
+    global _worker_rule, _worker_taxonomy
+    _worker_rule = rule
+    _worker_taxonomy = CompactTaxonomy(*columns)
+
+
+def _decide_in_worker(chunk: tuple):
+    return _decide(_worker_taxonomy, _worker_rule, chunk)
+
+
+def classify_parallel(
+    taxonomy: Taxonomy,
+    new_classification: Callable[[Type, Taxonomy], BaseClassifier],
+    target_type: Type,
+    instances: Iterable[Any],
+    rule: Rule,
+    processes: Optional[int] = None,
+    chunk_size: int = 1000,
+    start_method: Optional[str] = None,
+):
+    """
+    Classifies the instances by the items the rule picks for them, on a new classifier of the taxonomy.
+
+    new_classification is newExclusiveClassification or newInclusiveClassification, and the rule must be picklable,
+    e.g. a module level function. processes defaults to the cores of the machine, and a single process runs the rule
+    in the calling process without a pool.
+    Returns the classifier, and the rejected (taxonomic_item, instance) pairs with the reason of their rejection, as classify_many does.
+    """
+    classifier = new_classification(target_type = target_type, taxonomy = taxonomy)
+    chunks = list(chunked(instances, chunk_size))
+    processes = min(processes or os.cpu_count() or 1, len(chunks))
+    compact = taxonomy.compact()
+    if processes <= 1:
+        decisions = (_decide(compact, rule, chunk) for chunk in chunks)
+        return _merge(classifier, chunks, decisions)
+    # the columns only, as the lookup tables of the compact taxonomy are cheaper to rebuild in the worker than to send
+    columns = (compact.taxonomy_head, compact.names, compact.name_ids, compact.parents, compact.tiers)
+    context = multiprocessing.get_context(start_method)
+    with context.Pool(processes, initializer = _initialize_worker, initargs = (rule, columns)) as pool:
+        return _merge(classifier, chunks, pool.imap(_decide_in_worker, chunks))
+
+
+def _merge(classifier: BaseClassifier, chunks: list[tuple], decisions: Iterable[list[Decision]]):
+    # classifies each chunk as its decisions arrive, in input order
+    items = classifier.taxonomy.items
+    rejected = []
+    for chunk, chunk_decisions in zip(chunks, decisions):
+        classifier, chunk_rejected = classifier.classify_many(
+            (items[decision] if isinstance(decision, int) else decision, instance)
+            for instance, decision in zip(chunk, chunk_decisions) if decision is not None
+        )
+        rejected.extend(chunk_rejected)
+    return classifier, tuple(rejected)
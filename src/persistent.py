@@ -0,0 +1,398 @@
+"""
+Structures shared between the versions of the immutable models, so that deriving a new version does not copy the old one.
+"""
+from array import array
+from bisect import bisect_left
+from types import GeneratorType
+from typing import Any, Generic, Iterable, Optional, TypeVar
+from pydantic import BaseModel, ValidationError
+from pydantic.fields import ModelField
+
+
+T = TypeVar('T')
+
+# marks the hashable stand-ins built by hash_key, so that they never equal a value which is hashable in itself
+_SURROGATE = object()
+
+
+def hash_key(value: Any):
+    # the value when it is hashable, or a hashable stand-in for it which is equal for equal values,
+    # e.g. for pydantic models, which compare by value but are unhashable
+    # the stand-in holds the unhashable parts of values it knows nothing of, so it may still be unhashable
+    try:
+        hash(value)
+        return value
+    except TypeError:
+        pass
+    if isinstance(value, BaseModel):
+        return (_SURROGATE, type(value), tuple((field, hash_key(getattr(value, field))) for field in value.__fields__))
+    if isinstance(value, (list, tuple, PersistentVector)):
+        return (_SURROGATE, list if isinstance(value, list) else tuple, tuple(map(hash_key, value)))
+    if isinstance(value, dict):
+        return (_SURROGATE, dict, frozenset((key, hash_key(item)) for key, item in value.items()))
+    if isinstance(value, set):
+        return frozenset(value)
+    return value
+
+
+class AppendIndex:
+    """
+    A hash index of an append-only sequence, shared by every version of the sequence built by appending to the latest one.
+
+    Each version reads the index through its own length, so the entries appended by later versions are invisible to it.
+    Appending to an older version copies the part of the index which that version can see, leaving the later versions intact.
+    """
+    __slots__ = ('_positions', '_unhashable', '_length')
+
+    def __init__(self, values: Iterable[Any] = ()):
+        self._positions: dict[Any, int] = {} # the position of the first occurrence of each value, by its hash_key
+        self._unhashable: list[tuple[int, Any]] = [] # values without a hashable stand-in, found by a linear scan
+        self._length = 0 # the length of the latest version, which alone may append in place
+        for value in values:
+            self._add(value)
+
+    def __len__(self):
+        return self._length
+
+    def _add(self, value: Any):
+        try:
+            self._positions.setdefault(hash_key(value), self._length)
+        except TypeError:
+            self._unhashable.append((self._length, value))
+        self._length += 1
+
+    def _copy(self, length: int):
+        index = AppendIndex()
+        index._positions = {value: position for value, position in self._positions.items() if position < length}
+        index._unhashable = [entry for entry in self._unhashable if entry[0] < length]
+        index._length = length
+        return index
+
+    def appended(self, length: int, value: Any):
+        # the index of the version of the given length, with the value appended to it
+        index = self if length == self._length else self._copy(length)
+        index._add(value)
+        return index
+
+    def extended(self, length: int, values: Iterable[Any]):
+        # the index of the version of the given length, with the values appended to it
+        index = self if length == self._length else self._copy(length)
+        for value in values:
+            index._add(value)
+        return index
+
+    def find(self, value: Any, length: int) -> Optional[int]:
+        # the position of the value in the version of the given length
+        try:
+            position = self._positions.get(hash_key(value))
+        except TypeError:
+            for position, candidate in self._unhashable:
+                if position >= length:
+                    break
+                if candidate == value:
+                    return position
+            return None
+        return position if position is not None and position < length else None
+
+
+
+class AppendMultiIndex:
+    """
+    A hash index of an append-only sequence, with every position of each value, shared like an AppendIndex.
+    """
+    __slots__ = ('_positions', '_length')
+
+    def __init__(self, values: Iterable[Any] = ()):
+        self._positions: dict[Any, list[int]] = {} # the positions of each value, in ascending order
+        self._length = 0 # the length of the latest version, which alone may append in place
+        for value in values:
+            self._add(value)
+
+    def __len__(self):
+        return self._length
+
+    def _add(self, value: Any):
+        self._positions.setdefault(value, []).append(self._length)
+        self._length += 1
+
+    def _copy(self, length: int):
+        index = AppendMultiIndex()
+        for value, positions in self._positions.items():
+            positions = positions[:bisect_left(positions, length)]
+            if positions:
+                index._positions[value] = positions
+        index._length = length
+        return index
+
+    def appended(self, length: int, value: Any):
+        index = self if length == self._length else self._copy(length)
+        index._add(value)
+        return index
+
+    def extended(self, length: int, values: Iterable[Any]):
+        index = self if length == self._length else self._copy(length)
+        for value in values:
+            index._add(value)
+        return index
+
+    def find_all(self, value: Any, length: int) -> tuple[int, ...]:
+        # the positions of the value in the version of the given length
+        positions = self._positions.get(value, ())
+        if positions and positions[-1] >= length:
+            return tuple(positions[:bisect_left(positions, length)])
+        return tuple(positions)
+
+
+class AppendColumn:
+    """
+    A packed integer column of an append-only sequence, e.g. the node ids of its relationships, shared like an AppendIndex.
+
+    The positions holding -1 are kept apart, so that the entries which were unknown when appended can be resolved again.
+    """
+    __slots__ = ('_values', '_missing')
+
+    def __init__(self, values: Iterable[int] = ()):
+        self._values = array('i')
+        self._missing: list[int] = [] # the positions holding -1, in ascending order
+        self._extend(values)
+
+    def __len__(self):
+        return len(self._values)
+
+    def _extend(self, values: Iterable[int]):
+        for value in values:
+            if value == -1:
+                self._missing.append(len(self._values))
+            self._values.append(value)
+
+    def extended(self, length: int, values: Iterable[int]):
+        # the column of the version of the given length, with the values appended to it
+        if length == len(self._values):
+            column = self
+        else:
+            column = AppendColumn.__new__(AppendColumn)
+            column._values = self._values[:length]
+            column._missing = self._missing[:bisect_left(self._missing, length)]
+        column._extend(values)
+        return column
+
+    def get(self, position: int) -> int:
+        return self._values[position]
+
+    def values(self, length: int) -> array:
+        # a copy of the column of the version of the given length, as a view would stop the latest version from appending
+        return self._values[:length]
+
+    def missing(self, length: int) -> list[int]:
+        # the positions holding -1 in the version of the given length
+        return self._missing[:bisect_left(self._missing, length)]
+
+
+_BITS = 5
+_WIDTH = 1 << _BITS
+_MASK = _WIDTH - 1
+
+
+def _new_path(level: int, node: list):
+    if level == 0:
+        return node
+    return [_new_path(level - _BITS, node)]
+
+
+def _push_tail(count: int, level: int, parent: list, tail: list):
+    # copies the path down to the rightmost leaf, and hangs the full tail there
+    position = ((count - 1) >> level) & _MASK
+    node = list(parent)
+    if level == _BITS:
+        child = tail
+    elif position < len(parent):
+        child = _push_tail(count, level - _BITS, parent[position], tail)
+    else:
+        child = _new_path(level - _BITS, tail)
+    if position < len(node):
+        node[position] = child
+    else:
+        node.append(child)
+    return node
+
+
+def _set_in_path(level: int, parent: list, index: int, value: Any):
+    node = list(parent)
+    if level == 0:
+        node[index & _MASK] = value
+    else:
+        position = (index >> level) & _MASK
+        node[position] = _set_in_path(level - _BITS, parent[position], index, value)
+    return node
+
+
+def _iter_node(level: int, node: list):
+    if level == 0:
+        yield from node
+    else:
+        for child in node:
+            yield from _iter_node(level - _BITS, child)
+
+
+class PersistentVector(Generic[T]):
+    """
+    An immutable sequence where appending and replacing an element copy a path of the tree, and share everything else.
+
+    The elements sit in the leaves of a 32-way trie, with the last (up to 32) elements kept in a separate tail,
+    so appending, replacing and indexing cost O(log32 n), which is a handful of steps for millions of elements.
+    It compares equal to tuples and lists holding the same elements, and validates as a pydantic field type.
+    """
+    __slots__ = ('_count', '_shift', '_root', '_tail')
+
+    def __init__(self, values: Iterable[T] = ()):
+        values = list(values)
+        count = len(values)
+        tail_offset = ((count - 1) >> _BITS) << _BITS if count else 0
+        nodes = [values[start: start + _WIDTH] for start in range(0, tail_offset, _WIDTH)]
+        shift = _BITS
+        while len(nodes) > _WIDTH:
+            nodes = [nodes[start: start + _WIDTH] for start in range(0, len(nodes), _WIDTH)]
+            shift += _BITS
+        self._count = count
+        self._shift = shift
+        self._root = nodes
+        self._tail = values[tail_offset:]
+
+    @classmethod
+    def _make(cls, count: int, shift: int, root: list, tail: list):
+        vector = cls.__new__(cls)
+        vector._count = count
+        vector._shift = shift
+        vector._root = root
+        vector._tail = tail
+        return vector
+
+    @classmethod
+    def __get_validators__(cls):
+        yield cls.validate
+
+    @classmethod
+    def validate(cls, value: Any, field: ModelField):
+        if isinstance(value, (str, bytes)) or not isinstance(value, (cls, tuple, list, GeneratorType)):
+            raise TypeError('a persistent vector, tuple or list is required')
+        if not field.sub_fields:
+            return value if isinstance(value, cls) else cls(value)
+        element_field = field.sub_fields[0]
+        elements, errors = [], []
+        for position, element in enumerate(value):
+            element, error = element_field.validate(element, {}, loc = str(position))
+            if error:
+                errors.append(error)
+            elements.append(element)
+        if errors:
+            raise ValidationError(errors, cls)
+        return cls(elements)
+
+    def _tail_offset(self):
+        return ((self._count - 1) >> _BITS) << _BITS if self._count else 0
+
+    def _leaf(self, index: int):
+        if index >= self._tail_offset():
+            return self._tail
+        node = self._root
+        for level in range(self._shift, 0, -_BITS):
+            node = node[(index >> level) & _MASK]
+        return node
+
+    def _position(self, index: int):
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError('persistent vector index out of range')
+        return index
+
+    def appended(self, value: T):
+        count, shift = self._count, self._shift
+        if count - self._tail_offset() < _WIDTH:
+            return self._make(count + 1, shift, self._root, self._tail + [value])
+        if (count >> _BITS) > (1 << shift):
+            # the root is full, the tree grows a level
+            root = [self._root, _new_path(shift, self._tail)]
+            shift += _BITS
+        else:
+            root = _push_tail(count, shift, self._root, self._tail)
+        return self._make(count + 1, shift, root, [value])
+
+    def extended(self, values: Iterable[T]):
+        vector = self
+        for value in values:
+            vector = vector.appended(value)
+        return vector
+
+    def replaced(self, index: int, value: T):
+        index = self._position(index)
+        if index >= self._tail_offset():
+            tail = list(self._tail)
+            tail[index & _MASK] = value
+            return self._make(self._count, self._shift, self._root, tail)
+        return self._make(self._count, self._shift, _set_in_path(self._shift, self._root, index, value), self._tail)
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return tuple(self[position] for position in range(*index.indices(self._count)))
+        index = self._position(index)
+        return self._leaf(index)[index & _MASK]
+
+    def __iter__(self):
+        yield from _iter_node(self._shift, self._root)
+        yield from self._tail
+
+    def __reversed__(self):
+        for index in range(self._count - 1, -1, -1):
+            yield self[index]
+
+    def __contains__(self, value: Any):
+        return any(element == value for element in self)
+
+    def index(self, value: Any):
+        for position, element in enumerate(self):
+            if element == value:
+                return position
+        raise ValueError('value is not in the persistent vector')
+
+    def count(self, value: Any):
+        return sum(1 for element in self if element == value)
+
+    def __add__(self, values: Iterable[T]):
+        return self.extended(values)
+
+    def __eq__(self, other: Any):
+        if not isinstance(other, (PersistentVector, tuple, list)):
+            return NotImplemented
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    def __radd__(self, values: Any):
+        # a tuple or a list with the elements appended, as adding to the plain sequence would give
+        if not isinstance(values, (tuple, list)):
+            return NotImplemented
+        return values + type(values)(self)
+
+    def __hash__(self):
+        return hash(tuple(self))
+
+    def __repr__(self):
+        return f'{type(self).__name__}({tuple(self)!r})'
+
+
+class PersistentModel(BaseModel):
+    """
+    A model whose containers are persistent vectors, exported as tuples of plain values by dict() and json(), as they were before.
+    """
+
+    class Config:
+        json_encoders = {PersistentVector: tuple}
+
+    @classmethod
+    def _get_value(cls, value: Any, to_dict: bool, *args, **kwargs):
+        # copy() shares the vectors, while dict() converts them along with the models they hold
+        if to_dict and isinstance(value, PersistentVector):
+            value = tuple(value)
+        return super()._get_value(value, to_dict, *args, **kwargs)
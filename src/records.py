@@ -0,0 +1,176 @@
+"""
+Streaming import and export of taxonomies, classifications and domains as line delimited records, in CSV or JSONL.
+
+Readers and writers are generators over open text streams, and the loaders consume records in chunks,
+so a file is never held in memory as a whole, only the models built from it.
+Records are dicts of names:
+    taxonomy items are {name, parent}, with no parent for first tier items
+    classifications are {instance, item}
+    domain elements are {element, ...}, the element being the singular of a GRAPH member, with
+        {name} for nodes, {of, by} for compositions, embodiments, provenances and operations,
+        {provenance: [of, by], operation: [of, by]} for correspondances, {system, of, by} for passivities,
+        and {system, of, by, operations: [[of, by], ...]} for activities
+CSV columns hold the nested lists as json.
+"""
+import csv
+import json
+from itertools import islice
+from typing import Any, Callable, Iterable, Iterator, Optional, TextIO, Union
+
+from .validation import trusted
+from .taxonomy import Taxonomy, CompactTaxonomy, TaxonomicItem, TaxonomyBuilder, BaseClassifier
+from .composition import GRAPH, REJECTION, Domain, newDomain, buildDomain, _node_key
+
+
+TAXONOMY_FIELDS = ('name', 'parent')
+CLASSIFICATION_FIELDS = ('instance', 'item')
+DOMAIN_FIELDS = ('element', 'name', 'system', 'of', 'by', 'provenance', 'operation', 'operations')
+
+# the domain elements by the name records give them
+ELEMENTS = {element.singular: element for element in GRAPH}
+
+
+def read_jsonl(stream: TextIO) -> Iterator[dict]:
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+def write_jsonl(stream: TextIO, records: Iterable[dict]):
+    for record in records:
+        stream.write(json.dumps(record))
+        stream.write('\n')
+
+
+def read_csv(stream: TextIO) -> Iterator[dict]:
+    # empty cells are read as missing values
+    for row in csv.DictReader(stream):
+        yield {field: value for field, value in row.items() if value != ''}
+
+
+def write_csv(stream: TextIO, records: Iterable[dict], fields: Iterable[str]):
+    writer = csv.DictWriter(stream, fieldnames = tuple(fields))
+    writer.writeheader()
+    for record in records:
+        writer.writerow({
+            field: json.dumps(value) if isinstance(value, (list, tuple)) else value
+            for field, value in record.items() if value is not None
+        })
+
+
+def chunked(records: Iterable[Any], size: int) -> Iterator[tuple]:
+    records = iter(records)
+    while chunk := tuple(islice(records, size)):
+        yield chunk
+
+
+def _nested(value: Union[str, list]):
+    # nested lists arrive as json from CSV, and as lists from JSONL
+    return json.loads(value) if isinstance(value, str) else value
+
+
+def taxonomy_from_records(taxonomy: Taxonomy, records: Iterable[dict]):
+    # adds the items in order, so a parent must come before its children
+    # returns the taxonomy, and the records whose parent is not part of it
+    builder = TaxonomyBuilder(taxonomy)
+    rejected = []
+    for record in records:
+        parent = record.get('parent')
+        if builder.add(record['name'], trusted(TaxonomicItem, name = parent) if parent else None) is None:
+            rejected.append(record)
+    return builder.freeze(), tuple(rejected)
+
+
+def taxonomy_records(taxonomy: Union[Taxonomy, CompactTaxonomy]) -> Iterator[dict]:
+    if isinstance(taxonomy, CompactTaxonomy):
+        parents = taxonomy.parents
+    else:
+        parents = [-1] * taxonomy.items_count
+        for parent, children in enumerate(taxonomy.children_map):
+            for child in children:
+                parents[child] = parent
+    names = [item.name for item in taxonomy.items]
+    for name, parent in zip(names, parents):
+        yield {'name': name, 'parent': names[parent] if parent != -1 else None}
+
+
+def classify_records(
+    classifier: BaseClassifier,
+    records: Iterable[dict],
+    instance: Callable[[Any], Any] = lambda value: value,
+    chunk_size: int = 10000,
+):
+    # classifies each chunk of records with classify_many, the instance being built from the record value
+    # returns the classifier, and the rejected records with the reason of their rejection
+    rejected = []
+    for chunk in chunked(records, chunk_size):
+        pairs = tuple((trusted(TaxonomicItem, name = record['item']), instance(record['instance'])) for record in chunk)
+        classifier, chunk_rejected = classifier.classify_many(pairs)
+        if chunk_rejected:
+            # classify_many reports the very pairs it was given
+            records_by_pair = {id(pair): record for pair, record in zip(pairs, chunk)}
+            rejected.extend((records_by_pair[id(pair)], reason) for pair, reason in chunk_rejected)
+    return classifier, tuple(rejected)
+
+
+def classification_records(classifier: BaseClassifier, instance: Callable[[Any], Any] = lambda value: value) -> Iterator[dict]:
+    # every classification of every instance, the record value being built from the instance
+    items = classifier.taxonomy.items
+    for position, taxonomy_index in classifier.iter_classification_pairs():
+        yield {'instance': instance(classifier.classified_instances[position]), 'item': items[taxonomy_index].name}
+
+
+def domain_from_records(records: Iterable[dict], domain: Optional[Domain] = None, chunk_size: int = 10000):
+    """
+    Loads the domain elements of each chunk of records with buildDomain, on top of the given domain or of a new one.
+
+    Within a chunk the records may come in any order, while across chunks nodes must come before the relationships referencing them.
+    Returns the domain, and the rejected rows as buildDomain reports them, along with the records of an unknown element,
+    as (element, record, REJECTION.UNKNOWN_ELEMENT), the element being None when the record names none of GRAPH.
+    """
+    rejected = []
+    for chunk in chunked(records, chunk_size):
+        rows = {element: [] for element in GRAPH}
+        for record in chunk:
+            element = ELEMENTS.get(record.get('element'))
+            if element is None or element == GRAPH.INFLUENCE:
+                # influences are written, and read, as the passivities and activities they contain
+                rejected.append((element, record, REJECTION.UNKNOWN_ELEMENT))
+                continue
+            match element:
+                case GRAPH.THING | GRAPH.MATERIAL | GRAPH.SYSTEM:
+                    rows[element].append(record['name'])
+                case GRAPH.CORRESPONDANCE:
+                    rows[element].append((tuple(_nested(record['provenance'])), tuple(_nested(record['operation']))))
+                case GRAPH.PASSIVITY:
+                    rows[element].append((record['system'], record['of'], record['by']))
+                case GRAPH.ACTIVITY:
+                    operations = tuple(map(tuple, _nested(record.get('operations', []))))
+                    rows[element].append((record['system'], record['of'], record['by'], operations))
+                case _:
+                    rows[element].append((record['of'], record['by']))
+        domain, chunk_rejected = buildDomain(domain = domain, **{element.plural: rows[element] for element in GRAPH if element != GRAPH.INFLUENCE})
+        rejected.extend(chunk_rejected)
+    return domain if domain is not None else newDomain(), tuple(rejected)
+
+
+def domain_records(domain: Domain) -> Iterator[dict]:
+    # the nodes, then the relationships, so that reading the records back in chunks finds every node referenced
+    # influences are written as the passivities and activities they contain
+    def pair(relationship: Any):
+        return [_node_key(relationship.of), _node_key(relationship.by)]
+
+    for element in (GRAPH.THING, GRAPH.MATERIAL, GRAPH.SYSTEM):
+        for node in domain.get_element_container(element):
+            yield {'element': element.singular, 'name': _node_key(node)}
+    for element in (GRAPH.COMPOSITION, GRAPH.EMBODIMENT, GRAPH.PROVENANCE, GRAPH.OPERATION):
+        for relationship in domain.get_element_container(element):
+            yield {'element': element.singular, 'of': _node_key(relationship.of), 'by': _node_key(relationship.by)}
+    for correspondance in domain.correspondances:
+        yield {'element': GRAPH.CORRESPONDANCE.singular, 'provenance': pair(correspondance.provenance), 'operation': pair(correspondance.operation)}
+    for influence in domain.influences:
+        record = {'system': _node_key(influence.system), 'of': _node_key(influence.of), 'by': _node_key(influence.by)}
+        if influence.containing.influence_type == 'Activity':
+            yield {'element': GRAPH.ACTIVITY.singular, **record, 'operations': [pair(operation) for operation in influence.containing.operations]}
+        else:
+            yield {'element': GRAPH.PASSIVITY.singular, **record}
@@ -0,0 +1,250 @@
+"""
+Binary snapshots of taxonomies and domains, as an interned string table and int columns, holding each node once.
+
+A snapshot is the magic bytes, the length of a json header, the header, then the sections it lists, each aligned to 8 bytes.
+The sections are the raw bytes of arrays, so they are read back as memoryviews over the file rather than parsed,
+and open_taxonomy maps the file to answer queries without building the items at all.
+Loading trusts the snapshot, building the models without validation unless full validation is on.
+"""
+import json
+import mmap
+import sys
+from array import array
+from typing import Any, Iterable, Union
+
+from .validation import trusted
+from .taxonomy import Taxonomy, TaxonomyHead, CompactTaxonomy, _LazySequence
+from .composition import (
+    Domain, Thing, Material, System, Composition, Embodiment, Provenance, Operation, ProvOpCorrespondance,
+    Passivity, Activity, Influence, _node_key,
+)
+from .persistent import PersistentVector
+
+
+_MAGIC = b'SIMSNAP\x01'
+_ALIGNMENT = 8
+
+
+def _write(path: str, kind: str, meta: dict, strings: Iterable[str], columns: dict[str, array]):
+    encoded = [string.encode('utf-8') for string in strings]
+    string_offsets = array('q', [0])
+    for string in encoded:
+        string_offsets.append(string_offsets[-1] + len(string))
+    sections = {'strings': array('B', b''.join(encoded)), 'string_offsets': string_offsets, **columns}
+
+    header = {'kind': kind, 'byteorder': sys.byteorder, 'meta': meta, 'sections': {}}
+    position = 0
+    for name, column in sections.items():
+        header['sections'][name] = (column.typecode, position, len(column))
+        size = len(column) * column.itemsize
+        position += size + (-size % _ALIGNMENT)
+    header_bytes = json.dumps(header).encode('utf-8')
+    # pad the header with spaces, so that the sections start aligned
+    header_bytes += b' ' * (-(len(_MAGIC) + 8 + len(header_bytes)) % _ALIGNMENT)
+
+    with open(path, 'wb') as file:
+        file.write(_MAGIC)
+        file.write(len(header_bytes).to_bytes(8, 'little'))
+        file.write(header_bytes)
+        for column in sections.values():
+            size = len(column) * column.itemsize
+            file.write(column.tobytes())
+            file.write(bytes(-size % _ALIGNMENT))
+
+
+class _Snapshot:
+    # the header and sections of a snapshot held in a buffer, either read or mapped from a file
+
+    def __init__(self, buffer: Any, kind: str):
+        view = memoryview(buffer)
+        if bytes(view[:len(_MAGIC)]) != _MAGIC:
+            raise ValueError('The file is not a snapshot')
+        header_length = int.from_bytes(view[len(_MAGIC):len(_MAGIC) + 8], 'little')
+        header_end = len(_MAGIC) + 8 + header_length
+        self.header = json.loads(bytes(view[len(_MAGIC) + 8:header_end]))
+        if self.header['kind'] != kind:
+            raise ValueError(f'The file is a snapshot of a {self.header["kind"]}, not of a {kind}')
+        self.meta = self.header['meta']
+        self._data = view[header_end:]
+
+    def column(self, name: str):
+        typecode, offset, count = self.header['sections'][name]
+        size = count * array(typecode).itemsize
+        column = self._data[offset:offset + size]
+        if self.header['byteorder'] == sys.byteorder:
+            return column.cast(typecode)
+        swapped = array(typecode, column.tobytes())
+        swapped.byteswap()
+        return swapped
+
+    def strings(self):
+        # the string table, decoding each string when it is accessed
+        blob, offsets = self.column('strings'), self.column('string_offsets')
+        return _LazySequence(len(offsets) - 1, lambda index: sys.intern(str(blob[offsets[index]:offsets[index + 1]], 'utf-8')))
+
+
+def _read(path: str, kind: str):
+    with open(path, 'rb') as file:
+        return _Snapshot(file.read(), kind)
+
+
+def _map(path: str, kind: str):
+    with open(path, 'rb') as file:
+        return _Snapshot(mmap.mmap(file.fileno(), 0, access = mmap.ACCESS_READ), kind)
+
+
+def save_taxonomy(taxonomy: Union[Taxonomy, CompactTaxonomy], path: str):
+    compact = taxonomy if isinstance(taxonomy, CompactTaxonomy) else CompactTaxonomy.from_taxonomy(taxonomy)
+    child_offsets, children = compact.get_child_columns()
+    _write(path, 'taxonomy', {'name': compact.name}, compact.names, {
+        'name_ids': array('i', compact.name_ids),
+        'parents': array('i', compact.parents),
+        'tiers': array('i', compact.tiers),
+        'child_offsets': array('i', child_offsets),
+        'children': array('i', children),
+    })
+
+
+def _compact_taxonomy(snapshot: _Snapshot):
+    compact = CompactTaxonomy(
+        trusted(TaxonomyHead, name = snapshot.meta['name']),
+        snapshot.strings(),
+        snapshot.column('name_ids'),
+        snapshot.column('parents'),
+        snapshot.column('tiers'),
+    )
+    compact._child_offsets = snapshot.column('child_offsets')
+    compact._children = snapshot.column('children')
+    return compact
+
+
+def open_taxonomy(path: str):
+    # a compact taxonomy over the mapped file, which reads the names and columns of the items only as they are queried
+    return _compact_taxonomy(_map(path, 'taxonomy'))
+
+
+def load_taxonomy(path: str):
+    return _compact_taxonomy(_read(path, 'taxonomy')).to_taxonomy()
+
+
+# the influence type of each influence, as stored in the kind column
+_INFLUENCE_KINDS = ('Passivity', 'Activity')
+
+
+def save_domain(domain: Domain, path: str):
+    # every node is stored as the id of its name in the string table, and every relationship as the ids of its nodes
+    string_ids: dict[str, int] = {}
+    columns: dict[str, array] = {}
+
+    def ids(nodes: Iterable[Any]):
+        return array('i', (string_ids.setdefault(_node_key(node), len(string_ids)) for node in nodes))
+
+    def pairs(name: str, relationships: Iterable[Any]):
+        relationships = tuple(relationships)
+        columns[f'{name}_of'] = ids(relationship.of for relationship in relationships)
+        columns[f'{name}_by'] = ids(relationship.by for relationship in relationships)
+
+    def operation_lists(name: str, operation_lists: Iterable[list[Operation]]):
+        # the operations of each activity, laid out by activity, offsets[i]:offsets[i + 1] being those of activity i
+        offsets = array('i', [0])
+        operations = []
+        for activity_operations in operation_lists:
+            operations.extend(activity_operations)
+            offsets.append(len(operations))
+        columns[f'{name}_operation_offsets'] = offsets
+        pairs(f'{name}_operations', operations)
+
+    for container in ('things', 'materials', 'systems', 'materialisation'):
+        columns[container] = ids(getattr(domain, container))
+    for container in ('compositions', 'embodiments', 'provenances', 'operations', 'passivities', 'activities'):
+        pairs(container, getattr(domain, container))
+    operation_lists('activities', (activity.operations for activity in domain.activities))
+    pairs('correspondance_provenances', (correspondance.provenance for correspondance in domain.correspondances))
+    pairs('correspondance_operations', (correspondance.operation for correspondance in domain.correspondances))
+    pairs('influences', domain.influences)
+    columns['influences_system'] = ids(influence.system for influence in domain.influences)
+    columns['influences_kind'] = array('i', (_INFLUENCE_KINDS.index(influence.containing.influence_type) for influence in domain.influences))
+    operation_lists('influences', (
+        influence.containing.operations if influence.containing.influence_type == 'Activity' else ()
+        for influence in domain.influences
+    ))
+
+    _write(path, 'domain', {}, string_ids, columns)
+
+
+def load_domain(path: str):
+    snapshot = _read(path, 'domain')
+    strings = list(snapshot.strings())
+    # one object per node, and per provenance and operation, shared by every container and relationship referencing it
+    nodes = {model: {} for model in (Thing, Material, System)}
+    relationships = {model: {} for model in (Provenance, Operation)}
+
+    def node(model: type, string_id: int):
+        known = nodes[model]
+        if string_id not in known:
+            known[string_id] = trusted(model, name = strings[string_id])
+        return known[string_id]
+
+    def container(name: str, model: type):
+        return [node(model, string_id) for string_id in snapshot.column(name)]
+
+    def ends(name: str):
+        return zip(snapshot.column(f'{name}_of'), snapshot.column(f'{name}_by'))
+
+    def pairs(name: str, model: type, by_model: type = Thing):
+        shared = relationships.get(model, {})
+        built = []
+        for of, by in ends(name):
+            relationship = shared.get((of, by))
+            if relationship is None:
+                relationship = trusted(model, of = node(Thing, of), by = node(by_model, by))
+                if model in relationships:
+                    shared.setdefault((of, by), relationship)
+            built.append(relationship)
+        return built
+
+    def operation_lists(name: str):
+        offsets = snapshot.column(f'{name}_operation_offsets')
+        operations = pairs(f'{name}_operations', Operation)
+        return [operations[offsets[index]:offsets[index + 1]] for index in range(len(offsets) - 1)]
+
+    def influence(influence_type: str, of: int, by: int, operations: list[Operation]):
+        if influence_type == 'Activity':
+            return trusted(Activity, influence_type = influence_type, of = node(Thing, of), by = node(Thing, by), operations = operations)
+        return trusted(Passivity, influence_type = influence_type, of = node(Thing, of), by = node(Thing, by))
+
+    # the provenances and operations come first, so that the relationships referencing them share their objects
+    provenances = pairs('provenances', Provenance)
+    operations = pairs('operations', Operation)
+    activities = [
+        influence('Activity', of, by, activity_operations)
+        for (of, by), activity_operations in zip(ends('activities'), operation_lists('activities'))
+    ]
+    passivities = [influence('Passivity', of, by, []) for of, by in ends('passivities')]
+    influences = [
+        trusted(Influence, system = node(System, system), containing = influence(_INFLUENCE_KINDS[kind], of, by, influence_operations))
+        for kind, system, (of, by), influence_operations in zip(
+            snapshot.column('influences_kind'),
+            snapshot.column('influences_system'),
+            ends('influences'),
+            operation_lists('influences'),
+        )
+    ]
+
+    return trusted(Domain,
+        things = PersistentVector(container('things', Thing)),
+        materials = PersistentVector(container('materials', Material)),
+        systems = PersistentVector(container('systems', System)),
+        materialisation = PersistentVector(container('materialisation', Thing)),
+        compositions = PersistentVector(pairs('compositions', Composition)),
+        embodiments = PersistentVector(pairs('embodiments', Embodiment, Material)),
+        provenances = PersistentVector(provenances),
+        operations = PersistentVector(operations),
+        correspondances = PersistentVector(
+            trusted(ProvOpCorrespondance, provenance = provenance, operation = operation)
+            for provenance, operation in zip(pairs('correspondance_provenances', Provenance), pairs('correspondance_operations', Operation))
+        ),
+        influences = PersistentVector(influences),
+        activities = PersistentVector(activities),
+        passivities = PersistentVector(passivities),
+    )
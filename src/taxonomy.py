@@ -1,7 +1,18 @@
-from pydantic import BaseModel, create_model, ValidationError, validator, Field, root_validator
-from typing import Union, Optional, Type, Any, overload
+from pydantic import BaseModel, create_model, ValidationError, validator, Field, root_validator, PrivateAttr
+from typing import Union, Optional, Type, Any, Callable, Iterable, overload
+from collections.abc import Sequence
+from enum import Enum, auto
+from abc import abstractmethod
+from contextlib import contextmanager
+from time import perf_counter
+import logging
 from itertools import repeat
-from rich.pretty import pprint
+from array import array
+import sys
+
+from .validation import trusted
+from .instrumentation import instrumented
+from .persistent import AppendIndex, PersistentModel, PersistentVector, hash_key
 
 
 class TaxonomyHead(BaseModel):
@@ -12,6 +23,20 @@ class TaxonomicItem(BaseModel):
     name: str
 
 
+def _item_key(item: TaxonomicItem):
+    # taxonomic items compare by value, so their name stands in for them as a hash key
+    return getattr(item, 'name', None)
+
+
+def _raw_field(value: Any, field: str):
+    # a field of a model, or of the dict of a model before its validation
+    return value[field] if isinstance(value, dict) else getattr(value, field)
+
+
+def _raw_name(item: Any):
+    return _raw_field(item, 'name')
+
+
 class FirstTierBind(BaseModel):
     taxonomy: TaxonomyHead
     child: TaxonomicItem
@@ -29,7 +54,9 @@ class Taxonomy(BaseModel):
     first_tier_binds: tuple[FirstTierBind, ...] = ()
     subsequent_tiers: tuple[int, ...] = ()
     subsequent_tier_binds: tuple[SubsequentTierBind, ...] = ()
-    #children_map: tuple[tuple[int,...], ...] TODO
+    children_map: tuple[tuple[int, ...], ...] = () # the child item indices, at the index of each parent item
+    _item_indices: Optional[dict] = PrivateAttr(default=None) # built lazily, the taxonomy is never changed in place
+    _parent_indices: Optional[tuple[int, ...]] = PrivateAttr(default=None) # built lazily from the children map
     
     @property
     def name(self):
@@ -47,42 +74,127 @@ class Taxonomy(BaseModel):
     def subsequent_tier_items_count(self):
         return len(self.subsequent_tiers)
     
+    @root_validator(pre = True)
+    @instrumented
+    def derive_children_map(cls, values):
+        # taxonomies saved before the children map was kept have none, and may hold tier positions one past their item
+        # so both are derived from the order of the items and of their binds, a subsequent tier item following its parent
+        if 'children_map' in values:
+            return values
+        items = tuple(values.get('items', ()))
+        binds = iter(values.get('subsequent_tier_binds', ()))
+        bind = next(binds, None)
+        item_indices, children_map, first_tier, subsequent_tiers = {}, [], [], []
+        for position, item in enumerate(items):
+            children_map.append([])
+            name = _raw_name(item)
+            if bind is not None and _raw_name(_raw_field(bind, 'child')) == name and _raw_name(_raw_field(bind, 'parent')) in item_indices:
+                children_map[item_indices[_raw_name(_raw_field(bind, 'parent'))]].append(position)
+                subsequent_tiers.append(position)
+                bind = next(binds, None)
+            else:
+                first_tier.append(position)
+            item_indices.setdefault(name, position)
+        return values | {
+            'first_tier': tuple(first_tier),
+            'subsequent_tiers': tuple(subsequent_tiers),
+            'children_map': tuple(map(tuple, children_map)),
+        }
+
     @root_validator
+    @instrumented
     def state_check(cls, values):
         if len(values['items']) != (len(values['first_tier']) + (len(values['subsequent_tiers']))):
             raise ValueError('The state of the taxonomy is corrupted, the total items do not match the sum of entries for first and subsequent tiers')
+        if len(values['items']) != len(values['children_map']):
+            raise ValueError('The state of the taxonomy is corrupted, the total items do not match the entries of the children map')
         return values
     
     @overload
     def get_children(self):
         ...
     
+    @instrumented
     def get_children(self, target: Optional[TaxonomicItem] = None):
         if target == None:
             # Early return to to supply the two simple cases: initial and first tier
-            return self.items[self.first_tier[0]: self.first_tier[-1]] if len(self.items) else ()
-        def targetter(sub, target):
-            if sub.parent == target:
-                return sub.child
-        return tuple(map(targetter, self.subsequent_tier_binds, repeat(target,)))
+            return tuple(self.items[index] for index in self.first_tier)
+        index = self.get_index(target)
+        if not index:
+            return ()
+        return tuple(self.items[child] for child in self.children_map[index[0]])
 
+    @instrumented
     def get_decendents(self, target: Optional[TaxonomicItem] = None):
         if target == None:
             # Early return to to supply the two simple cases: initial and first tier
             return self.items
-        return tuple(map(self.get_children, self.items))
+        return tuple(self.iter_decendents(target))
+
+    def iter_decendents(self, target: Optional[TaxonomicItem] = None):
+        # depth first, each item is yielded before its own decendents
+        if target == None:
+            roots = self.first_tier
+        else:
+            index = self.get_index(target)
+            if not index:
+                return
+            roots = self.children_map[index[0]]
+        for index in self.iter_decendent_indices(roots):
+            yield self.items[index]
+
+    def iter_decendent_indices(self, roots: Iterable[int]):
+        # depth first, each root index is yielded before the indices of its decendents
+        stack = [iter(roots)]
+        while stack:
+            for index in stack[-1]:
+                yield index
+                stack.append(iter(self.children_map[index]))
+                break
+            else:
+                stack.pop()
+
+    def iter_ancestors(self, target: TaxonomicItem):
+        # from the parent of the target up to its first tier item
+        index = self.get_index(target)
+        if not index:
+            return
+        if self._parent_indices == None:
+            parent_indices = [-1] * len(self.items)
+            for parent, children in enumerate(self.children_map):
+                for child in children:
+                    parent_indices[child] = parent
+            self._parent_indices = tuple(parent_indices)
+        parent = self._parent_indices[index[0]]
+        while parent != -1:
+            yield self.items[parent]
+            parent = self._parent_indices[parent]
     
+    def compact(self):
+        return CompactTaxonomy.from_taxonomy(self)
+
+    def get_item_indices(self):
+        # maps each item to the position of its first occurrence, as items.index would find it
+        if self._item_indices == None:
+            item_indices = {}
+            for index, item in enumerate(self.items):
+                item_indices.setdefault(_item_key(item), index)
+            self._item_indices = item_indices
+        return self._item_indices
+
+    @instrumented
     def get_index(self, target: TaxonomicItem):
-        try: 
-            return (self.items.index(target),)
-        except ValueError:
-            return ()
+        index = self.get_item_indices().get(_item_key(target))
+        return (index,) if index != None else ()
  
+    @instrumented
     def get_indices(self, *targets: TaxonomicItem):
-        targets = targets
-        return tuple(map((self.get_index)[0], targets))
+        # the index of each target at its position, None for targets which are not part of the taxonomy
+        item_indices = self.get_item_indices()
+        return tuple(map(item_indices.get, map(_item_key, targets)))
 
 
+@instrumented
 def create_taxonomy(name: str):
     return Taxonomy(
         taxonomy_head = TaxonomyHead(
@@ -93,86 +205,542 @@ def create_taxonomy(name: str):
         first_tier_binds = (),
         subsequent_tiers = (),
         subsequent_tier_binds =(),
+        children_map = (),
         )
 
 
+@instrumented
 def add_taxonomic_item(taxonomy: Taxonomy, name: str, parent: Optional[TaxonomicItem] = None):
     if parent != None:
-        if parent not in taxonomy.items:
+        parent_index = taxonomy.get_index(parent)
+        if not parent_index:
             # Early return to stop a taxonomy from becoming corrupted with items from other taxonomies
             return taxonomy
+        parent_index = parent_index[0]
     item = TaxonomicItem(name = name)
-    return Taxonomy(
-        taxonomy_head = TaxonomyHead(
-            name = taxonomy.name
-        ),
+    # the new item has no children, and is appended to the children of its parent
+    children_map = taxonomy.children_map + ((),)
+    if parent:
+        children_map = children_map[:parent_index] + (children_map[parent_index] + (len(taxonomy.items),),) + children_map[parent_index + 1:]
+    return trusted(Taxonomy,
+        taxonomy_head = taxonomy.taxonomy_head,
         items = taxonomy.items + (item,),
-        first_tier = taxonomy.first_tier if parent else taxonomy.first_tier + (len(taxonomy.items) + 1,) if len(taxonomy.items) else (0,),
+        first_tier = taxonomy.first_tier if parent else taxonomy.first_tier + (len(taxonomy.items),),
         first_tier_binds = taxonomy.first_tier_binds if parent else taxonomy.first_tier_binds + (
             FirstTierBind(
                 taxonomy = taxonomy.taxonomy_head,
                 child = item 
             ),),
-        subsequent_tiers = taxonomy.subsequent_tiers if not parent else taxonomy.subsequent_tiers + (len(taxonomy.items) + 1,),
+        subsequent_tiers = taxonomy.subsequent_tiers if not parent else taxonomy.subsequent_tiers + (len(taxonomy.items),),
         subsequent_tier_binds = taxonomy.subsequent_tier_binds if not parent else taxonomy.subsequent_tier_binds + (
             SubsequentTierBind(
                 parent = parent,
                 child = item 
             ),),
+        children_map = children_map,
         )
 
 
-class BaseClassifier(BaseModel):
+class TaxonomyBuilder:
+    """
+    A mutable accumulator of taxonomic items, which freezes into a single validated taxonomy.
+
+    Adding items through the builder gives the same taxonomy as chained add_taxonomic_item calls,
+    without copying and re-validating the whole taxonomy for every item.
+    """
+
+    def __init__(self, taxonomy: Taxonomy):
+        self.taxonomy_head = taxonomy.taxonomy_head
+        self.items = list(taxonomy.items)
+        self.first_tier = list(taxonomy.first_tier)
+        self.first_tier_binds = list(taxonomy.first_tier_binds)
+        self.subsequent_tiers = list(taxonomy.subsequent_tiers)
+        self.subsequent_tier_binds = list(taxonomy.subsequent_tier_binds)
+        self.children_map = list(map(list, taxonomy.children_map))
+        self._item_indices = dict(taxonomy.get_item_indices())
+
+    def add(self, name: str, parent: Optional[TaxonomicItem] = None):
+        if parent is not None:
+            if _item_key(parent) not in self._item_indices:
+                # Early return to stop a taxonomy from becoming corrupted with items from other taxonomies
+                return None
+        item = TaxonomicItem(name = name)
+        index = len(self.items)
+        self.items.append(item)
+        self._item_indices.setdefault(_item_key(item), index)
+        self.children_map.append([])
+        if parent:
+            self.children_map[self._item_indices[_item_key(parent)]].append(index)
+            self.subsequent_tiers.append(index)
+            self.subsequent_tier_binds.append(SubsequentTierBind(
+                parent = parent,
+                child = item,
+            ))
+        else:
+            self.first_tier.append(index)
+            self.first_tier_binds.append(FirstTierBind(
+                taxonomy = self.taxonomy_head,
+                child = item,
+            ))
+        return item
+
+    @instrumented
+    def freeze(self):
+        # every item and bind was validated as it was added
+        return trusted(Taxonomy,
+            taxonomy_head = self.taxonomy_head,
+            items = tuple(self.items),
+            first_tier = tuple(self.first_tier),
+            first_tier_binds = tuple(self.first_tier_binds),
+            subsequent_tiers = tuple(self.subsequent_tiers),
+            subsequent_tier_binds = tuple(self.subsequent_tier_binds),
+            children_map = tuple(map(tuple, self.children_map)),
+        )
+
+
+@instrumented
+def add_taxonomic_items(taxonomy: Taxonomy, items: Iterable[tuple[str, Optional[TaxonomicItem]]]):
+    # items whose parent is not (yet) part of the taxonomy are skipped, as in add_taxonomic_item
+    builder = TaxonomyBuilder(taxonomy)
+    for name, parent in items:
+        builder.add(name, parent)
+    return builder.freeze()
+
+
+class _LazySequence(Sequence):
+    # a read only sequence which builds its elements when they are accessed
+
+    def __init__(self, length: int, getter: Callable[[int], Any]):
+        self._length = length
+        self._getter = getter
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return tuple(map(self._getter, range(*position.indices(self._length))))
+        if position < 0:
+            position += self._length
+        if not 0 <= position < self._length:
+            raise IndexError('sequence index out of range')
+        return self._getter(position)
+
+
+class CompactTaxonomy:
+    """
+    An array backed taxonomy, for taxonomies too large to hold as one model per item and bind.
+
+    Item names are interned into a name table, and every item costs an int for its name, its parent and its tier.
+    It answers the read side of the Taxonomy api, building items and binds only when they are accessed.
+    """
+
+    def __init__(self, taxonomy_head: TaxonomyHead, names: Sequence[str], name_ids: Sequence[int], parents: Sequence[int], tiers: Sequence[int]):
+        # the columns are arrays, or int memoryviews over a snapshot, see snapshot.open_taxonomy
+        self.taxonomy_head = taxonomy_head
+        self.names = names # the interned name table
+        self.name_ids = name_ids # the name table index of each item
+        self.parents = parents # the index of the parent of each item, -1 for first tier items
+        self.tiers = tiers # the depth of each item, 0 for first tier items
+        self._name_indices: Optional[dict[str, int]] = None
+        self._first_items: Optional[array] = None # the first item with each name, as items.index would find it
+        self._child_offsets: Optional[Sequence[int]] = None
+        self._children: Optional[Sequence[int]] = None
+        self._first_tier: Optional[array] = None
+        self._subsequent_tiers: Optional[array] = None
+
+    @classmethod
+    def from_items(cls, taxonomy_head: TaxonomyHead, items: Iterable[tuple[str, Optional[TaxonomicItem]]]):
+        # items whose parent is not (yet) part of the taxonomy are skipped, as in add_taxonomic_item
+        names: list[str] = []
+        name_indices: dict[str, int] = {}
+        first_items: list[int] = []
+        name_ids, parents, tiers = array('i'), array('i'), array('i')
+        for name, parent in items:
+            parent_index = -1
+            if parent is not None:
+                parent_name_id = name_indices.get(_item_key(parent))
+                if parent_name_id == None:
+                    continue
+                parent_index = first_items[parent_name_id]
+            name_id = name_indices.get(name)
+            if name_id == None:
+                name_id = name_indices[name] = len(names)
+                names.append(sys.intern(name))
+                first_items.append(len(name_ids))
+            name_ids.append(name_id)
+            parents.append(parent_index)
+            tiers.append(tiers[parent_index] + 1 if parent_index != -1 else 0)
+        compact = cls(taxonomy_head, names, name_ids, parents, tiers)
+        compact._name_indices = name_indices
+        compact._first_items = array('i', first_items)
+        return compact
+
+    @classmethod
+    def from_taxonomy(cls, taxonomy: Taxonomy):
+        parents = [None] * taxonomy.items_count
+        for parent, children in enumerate(taxonomy.children_map):
+            for child in children:
+                parents[child] = taxonomy.items[parent]
+        return cls.from_items(taxonomy.taxonomy_head, zip((item.name for item in taxonomy.items), parents))
+
+    def to_taxonomy(self):
+        # the columns hold a consistent taxonomy, so the models are built as trusted, like TaxonomyBuilder.freeze does
+        items = tuple(map(self._item, range(self.items_count)))
+        child_offsets, children = self.get_child_columns()
+        return trusted(Taxonomy,
+            taxonomy_head = self.taxonomy_head,
+            items = items,
+            first_tier = tuple(self.first_tier),
+            first_tier_binds = tuple(trusted(FirstTierBind, taxonomy = self.taxonomy_head, child = items[index]) for index in self.first_tier),
+            subsequent_tiers = tuple(self.subsequent_tiers),
+            subsequent_tier_binds = tuple(
+                trusted(SubsequentTierBind, parent = items[self.parents[index]], child = items[index])
+                for index in self.subsequent_tiers
+            ),
+            children_map = tuple(tuple(children[child_offsets[index]:child_offsets[index + 1]]) for index in range(self.items_count)),
+        )
+
+    @property
+    def name(self):
+        return self.taxonomy_head.name
+
+    @property
+    def items_count(self):
+        return len(self.name_ids)
+
+    @property
+    def first_tier_items_count(self):
+        return len(self.first_tier)
+
+    @property
+    def subsequent_tier_items_count(self):
+        return len(self.subsequent_tiers)
+
+    @property
+    def items(self):
+        return _LazySequence(self.items_count, self._item)
+
+    @property
+    def first_tier(self):
+        if self._first_tier == None:
+            self._first_tier = array('i', (index for index, tier in enumerate(self.tiers) if tier == 0))
+        return self._first_tier
+
+    @property
+    def subsequent_tiers(self):
+        if self._subsequent_tiers == None:
+            self._subsequent_tiers = array('i', (index for index, tier in enumerate(self.tiers) if tier != 0))
+        return self._subsequent_tiers
+
+    @property
+    def first_tier_binds(self):
+        def bind(position):
+            return FirstTierBind(
+                taxonomy = self.taxonomy_head,
+                child = self._item(self.first_tier[position]),
+            )
+        return _LazySequence(len(self.first_tier), bind)
+
+    @property
+    def subsequent_tier_binds(self):
+        def bind(position):
+            index = self.subsequent_tiers[position]
+            return SubsequentTierBind(
+                parent = self._item(self.parents[index]),
+                child = self._item(index),
+            )
+        return _LazySequence(len(self.subsequent_tiers), bind)
+
+    @property
+    def children_map(self):
+        return _LazySequence(self.items_count, lambda index: tuple(self._child_indices(index)))
+
+    def _item(self, index: int):
+        return trusted(TaxonomicItem, name = self.names[self.name_ids[index]])
+
+    def _child_indices(self, index: int):
+        child_offsets, children = self.get_child_columns()
+        return children[child_offsets[index]: child_offsets[index + 1]]
+
+    def get_child_columns(self):
+        if self._children is None:
+            # children are laid out by parent, offsets[i]:offsets[i + 1] being the children of item i
+            offsets = array('i', repeat(0, self.items_count + 1))
+            for parent in self.parents:
+                if parent != -1:
+                    offsets[parent + 1] += 1
+            for position in range(self.items_count):
+                offsets[position + 1] += offsets[position]
+            children = array('i', repeat(0, offsets[-1]))
+            cursors = array('i', offsets)
+            for child, parent in enumerate(self.parents):
+                if parent != -1:
+                    children[cursors[parent]] = child
+                    cursors[parent] += 1
+            self._child_offsets = offsets
+            self._children = children
+        return self._child_offsets, self._children
+
+    def get_index(self, target: TaxonomicItem):
+        if self._name_indices == None:
+            self._name_indices = {name: name_id for name_id, name in enumerate(self.names)}
+            self._first_items = array('i', repeat(-1, len(self.names)))
+            for index, name_id in enumerate(self.name_ids):
+                if self._first_items[name_id] == -1:
+                    self._first_items[name_id] = index
+        name_id = self._name_indices.get(_item_key(target))
+        return (self._first_items[name_id],) if name_id != None else ()
+
+    def get_indices(self, *targets: TaxonomicItem):
+        # the index of each target at its position, None for targets which are not part of the taxonomy
+        return tuple(index[0] if index else None for index in map(self.get_index, targets))
+
+    def get_children(self, target: Optional[TaxonomicItem] = None):
+        if target is None:
+            # the first tier items, as in Taxonomy.get_children
+            return tuple(map(self._item, self.first_tier))
+        index = self.get_index(target)
+        if not index:
+            return ()
+        return tuple(map(self._item, self._child_indices(index[0])))
+
+    def get_decendents(self, target: Optional[TaxonomicItem] = None):
+        if target is None:
+            return tuple(self.items)
+        return tuple(self.iter_decendents(target))
+
+    def iter_decendents(self, target: Optional[TaxonomicItem] = None):
+        # depth first, each item is yielded before its own decendents
+        if target is None:
+            roots = self.first_tier
+        else:
+            index = self.get_index(target)
+            if not index:
+                return
+            roots = self._child_indices(index[0])
+        stack = [iter(roots)]
+        while stack:
+            for index in stack[-1]:
+                yield self._item(index)
+                stack.append(iter(self._child_indices(index)))
+                break
+            else:
+                stack.pop()
+
+    def iter_ancestors(self, target: TaxonomicItem):
+        # from the parent of the target up to its first tier item
+        index = self.get_index(target)
+        if not index:
+            return
+        parent = self.parents[index[0]]
+        while parent != -1:
+            yield self._item(parent)
+            parent = self.parents[parent]
+
+
+class CLASSIFICATION(Enum):
+    """
+    Enumeration of the decisions a classifier takes when classifying an instance.
+    """
+    TYPE_REJECT = auto() # the instance does not match the target type
+    EXCLUSIVITY_REJECT = auto() # the instance is already classified by an exclusive classifier
+    TAXONOMY_REJECT = auto() # the taxonomic item is not part of the classifier's taxonomy
+    DUPLICATE_REJECT = auto() # the instance is already classified by the taxonomic item in an inclusive classifier
+    NEW = auto() # a first classification of the instance
+    APPEND = auto() # a further classification of an instance by an inclusive classifier
+
+
+ClassifyTracer = Callable[[CLASSIFICATION, TaxonomicItem, Any, float], None]
+
+# called with the decision, taxonomic item, classification target and elapsed seconds of every classification
+# tracing is off while it is None, which costs the classifiers a single check per call
+_classify_tracer: Optional[ClassifyTracer] = None
+
+
+def set_classify_tracer(tracer: Optional[ClassifyTracer]):
+    global _classify_tracer
+    previous = _classify_tracer
+    _classify_tracer = tracer
+    return previous
+
+
+@contextmanager
+def classify_tracing(tracer: ClassifyTracer):
+    previous = set_classify_tracer(tracer)
+    try:
+        yield
+    finally:
+        set_classify_tracer(previous)
+
+
+def logging_tracer(logger: logging.Logger = logging.getLogger(__name__), level: int = logging.DEBUG):
+    def tracer(event: CLASSIFICATION, taxonomic_item: TaxonomicItem, classification_target: Any, elapsed: float):
+        logger.log(level, 'classify %s: %r as %r in %.1fus', event.name, classification_target, taxonomic_item, elapsed * 1e6)
+    return tracer
+
+
+class BaseClassifier(PersistentModel):
     """
     The classifier is a datatype which binds instances of a given type, to a taxonomic structure.
+
+    It is abstract, the exclusive and inclusive classifiers implementing how an instance is classified.
     """
     target_type: Type
     taxonomy: Taxonomy
-    classified_instances: tuple[Any, ...] = ()
+    classified_instances: PersistentVector[Any] = PersistentVector()
+    _instance_index: Optional[AppendIndex] = PrivateAttr(default=None) # shared with the classifiers derived from this one
+    _classified_index: Optional[dict] = PrivateAttr(default=None) # built lazily, the classified instance positions by taxonomy index
 
     @root_validator
+    @instrumented
     def type_match(cls, values):
         for item in values['classified_instances']:
             if not isinstance(item, values['target_type']):
                 raise ValueError('A type instance has been included which does not match the target type')
         return values
 
+    def get_instance_index(self):
+        if self._instance_index == None:
+            self._instance_index = AppendIndex(self.classified_instances)
+        return self._instance_index
+
+    def get_instance_position(self, target: Any):
+        position = self.get_instance_index().find(target, len(self.classified_instances))
+        return (position,) if position is not None else ()
+
+    @instrumented
+    def classify(self, taxonomic_item: TaxonomicItem, classification_target: Type):
+        if _classify_tracer is None:
+            return self._classify(taxonomic_item, classification_target)[0]
+        start = perf_counter()
+        classifier, event = self._classify(taxonomic_item, classification_target)
+        _classify_tracer(event, taxonomic_item, classification_target, perf_counter() - start)
+        return classifier
+
+    @abstractmethod
+    def _classify(self, taxonomic_item: TaxonomicItem, classification_target: Type):
+        # returns the new classifier, and the classification decision
+        ...
+
+    @abstractmethod
+    def iter_classification_pairs(self):
+        # (instance position, taxonomy index) pairs, for every classification of every instance
+        ...
+
+    def get_classified_index(self):
+        if self._classified_index == None:
+            classified_index = {}
+            for position, taxonomy_index in self.iter_classification_pairs():
+                positions = classified_index.setdefault(taxonomy_index, [])
+                if not positions or positions[-1] != position:
+                    positions.append(position)
+            self._classified_index = classified_index
+        return self._classified_index
+
+    @instrumented
+    def get_classified_instances(self, taxonomic_item: TaxonomicItem, rollup: bool = False):
+        # the instances classified by the taxonomic item, and by its decendents too when rolling up
+        index = self.taxonomy.get_index(taxonomic_item)
+        if not index:
+            return ()
+        classified_index = self.get_classified_index()
+        if not rollup:
+            return tuple(self.classified_instances[position] for position in classified_index.get(index[0], ()))
+        taxonomy_indices = (index[0],) + tuple(self.taxonomy.iter_decendent_indices(self.taxonomy.children_map[index[0]]))
+        positions = {}
+        for taxonomy_index in taxonomy_indices:
+            positions.update(dict.fromkeys(classified_index.get(taxonomy_index, ())))
+        return tuple(self.classified_instances[position] for position in positions)
+
 
 class ExclusiveClassifier(BaseClassifier):
     # the index of a classification should match the index of the classified instance
     # the ints are the index position of the taxonomy item
-    classifications: tuple[int, ...] = ()
+    classifications: PersistentVector[int] = PersistentVector()
 
     def get_classification_indices(self, target: Any):
-        try:
-            instance_index = self.classified_instances.index(target)
-            return (self.classifications[instance_index],)
-        except ValueError:
-            return ()
+        instance_index = self.get_instance_position(target)
+        return tuple(self.classifications[position] for position in instance_index)
+
+    def iter_classification_pairs(self):
+        return enumerate(self.classifications)
 
     @root_validator
+    @instrumented
     def exclusivity(cls, values):
+        seen, unhashable = set(), []
         for item in values['classified_instances']:
-            if values['classified_instances'].count(item) > 1:
+            try:
+                key = hash_key(item)
+                repeated = key in seen
+                seen.add(key)
+            except TypeError:
+                repeated = item in unhashable
+                unhashable.append(item)
+            if repeated:
                 raise ValueError('A type instance has been included which is already present in a classification')
         return values
     
-    def classify(self, taxonomic_item: TaxonomicItem, classification_target: Type):
+    def _classify(self, taxonomic_item: TaxonomicItem, classification_target: Type):
         if not isinstance(classification_target, self.target_type): # Type exclusivity protector
-            return self
-        if classification_target in self.classified_instances: # Classification exclusivity protector
-            return self
-        try:
-            taxonomy_index = self.taxonomy.items.index(taxonomic_item)
-            return ExclusiveClassifier(
-                target_type = self.target_type,
-                taxonomy = self.taxonomy,
-                classified_instances = self.classified_instances + (classification_target,),
-                classifications = self.classifications + (taxonomy_index,),
-            )
-        except ValueError: # Catches wrong Taxonomic items for this classification structure
-            return self
+            return self, CLASSIFICATION.TYPE_REJECT
+        if self.get_instance_position(classification_target): # Classification exclusivity protector
+            return self, CLASSIFICATION.EXCLUSIVITY_REJECT
+        taxonomy_index = self.taxonomy.get_index(taxonomic_item)
+        if not taxonomy_index: # Catches wrong Taxonomic items for this classification structure
+            return self, CLASSIFICATION.TAXONOMY_REJECT
+        classifier = trusted(ExclusiveClassifier,
+            target_type = self.target_type,
+            taxonomy = self.taxonomy,
+            classified_instances = self.classified_instances.appended(classification_target),
+            classifications = self.classifications.appended(taxonomy_index[0]),
+        )
+        classifier._instance_index = self.get_instance_index().appended(len(self.classified_instances), classification_target)
+        return classifier, CLASSIFICATION.NEW
+
+    @instrumented
+    def classify_many(self, pairs: Iterable[tuple[TaxonomicItem, Any]]):
+        # applies the protections of classify to every (taxonomic_item, classification_target) pair, in order
+        # returns the new classifier, and the rejected pairs with the reason of their rejection
+        pairs = tuple(pairs)
+        item_indices = self.taxonomy.get_item_indices()
+        taxonomy_indices = tuple(item_indices.get(_item_key(taxonomic_item)) for taxonomic_item, _ in pairs)
+        instance_index = self.get_instance_index()
+        length = len(self.classified_instances)
+        instances, classifications, rejected = [], [], []
+        tracer = _classify_tracer
+        for pair, taxonomy_index in zip(pairs, taxonomy_indices):
+            start = perf_counter() if tracer is not None else 0.0
+            classification_target = pair[1]
+            if not isinstance(classification_target, self.target_type):
+                event = CLASSIFICATION.TYPE_REJECT
+            elif instance_index.find(classification_target, length) is not None:
+                event = CLASSIFICATION.EXCLUSIVITY_REJECT
+            elif taxonomy_index is None:
+                event = CLASSIFICATION.TAXONOMY_REJECT
+            else:
+                event = CLASSIFICATION.NEW
+                instance_index = instance_index.appended(length, classification_target)
+                length += 1
+                instances.append(classification_target)
+                classifications.append(taxonomy_index)
+            if event != CLASSIFICATION.NEW:
+                rejected.append((pair, event))
+            if tracer is not None:
+                tracer(event, pair[0], classification_target, perf_counter() - start)
+        if not instances:
+            return self, tuple(rejected)
+        classifier = trusted(ExclusiveClassifier,
+            target_type = self.target_type,
+            taxonomy = self.taxonomy,
+            classified_instances = self.classified_instances.extended(instances),
+            classifications = self.classifications.extended(classifications),
+        )
+        classifier._instance_index = instance_index
+        return classifier, tuple(rejected)
 
+@instrumented
 def newExclusiveClassification(target_type: Type, taxonomy: Taxonomy):
     return ExclusiveClassifier(
         target_type = target_type,
@@ -187,71 +755,141 @@ class InclusiveClassifier(BaseClassifier):
     """
     # the index of a tuple of classifications should match the index of the classified instance
     # the ints are the index position of the taxonomy item
+    # the tuples sit in a persistent vector, so updating one of them shares all the others with the previous classifier
 
-    classifications: tuple[tuple[int, ...], ...] = ()
+    classifications: PersistentVector[tuple[int, ...]] = PersistentVector()
 
     def get_classification_indices(self, target: Any):
-        try:
-            instance_index = self.classified_instances.index(target)
-            return (self.classifications.index(self.classifications[instance_index]),)
-        except ValueError:
-            return ()
+        # the classification tuple of the target, at the position of the target rather than the first equal tuple
+        instance_index = self.get_instance_position(target)
+        return tuple(self.classifications[position] for position in instance_index)
+
+    def iter_classification_pairs(self):
+        for position, taxonomy_indices in enumerate(self.classifications):
+            for taxonomy_index in taxonomy_indices:
+                yield position, taxonomy_index
 
     @root_validator
+    @instrumented
     def type_match(cls, values):
         for item in values['classified_instances']:
             if not isinstance(item, values['target_type']):
                 raise ValueError('A type instance has been included which does not match the target type')
         return values
     
-    def classify(self, taxonomic_item: TaxonomicItem, classification_target: Type):
+    def _classify(self, taxonomic_item: TaxonomicItem, classification_target: Type):
         if not isinstance(classification_target, self.target_type): # Type exclusivity protector
-            print("type excl check")
+            return self, CLASSIFICATION.TYPE_REJECT
+        taxonomy_index = self.taxonomy.get_index(taxonomic_item)
+        if not taxonomy_index: # Catches wrong Taxonomic items for this classification structure
+            return self, CLASSIFICATION.TAXONOMY_REJECT
+        instance_index = self.get_instance_position(classification_target)
+        if not instance_index:
+            # here we know this is a first classification of the instance
+            # therefore we create its classification tuple, at the position of the instance
+            classifier = trusted(InclusiveClassifier,
+                target_type = self.target_type,
+                taxonomy = self.taxonomy,
+                classified_instances = self.classified_instances.appended(classification_target),
+                classifications = self.classifications.appended(taxonomy_index),
+            )
+            classifier._instance_index = self.get_instance_index().appended(len(self.classified_instances), classification_target)
+            return classifier, CLASSIFICATION.NEW
+        # here we know this is a subsequent classification of an already classified instance
+        # therefore its classification tuple is replaced by one including the index position of the newly applied taxonomy item
+        position = instance_index[0]
+        if taxonomy_index[0] in self.classifications[position]: # Catches repeated classifications by the same item
+            return self, CLASSIFICATION.DUPLICATE_REJECT
+        return self._with_classification(position, self.classifications[position] + taxonomy_index), CLASSIFICATION.APPEND
+
+    @instrumented
+    def declassify(self, taxonomic_item: TaxonomicItem, classification_target: Type):
+        # removes the taxonomic item from the classifications of the instance, which stays classified (maybe by nothing)
+        instance_index = self.get_instance_position(classification_target)
+        if not instance_index: # Catches instances which are not classified
             return self
-        try:
-            taxonomy_index = self.taxonomy.get_index(taxonomic_item)
-            print("classification target", classification_target)
-            print("taxo indec", taxonomy_index)
-
-            if len(self.classifications) == 0:
-                # here we know this is a first classification
-                # therefore we create the first classification tuple, at position 0 in the classifications tuple
-                print("lenth check passes")
-                return InclusiveClassifier(
-                    target_type = self.target_type,
-                    taxonomy = self.taxonomy,
-                    classified_instances = (classification_target,),
-                    classifications = ((taxonomy_index[0],),)
-                )  
-            classification_index = self.get_classification_indices(classification_target)      
-            if len(classification_index) > 0:      
-                # here we know this is a subsequent classification of an already classified instance
-                # therefore we must find the correct classification tuple for the classified instance
-                # this classification tuple must be add/updated to include the index position of the newly applied taxonomy item
-                
-                print("class indec", classification_index)
-                new_classification_index = classification_index + (taxonomy_index[0],)
-                print(new_classification_index)
-                # get everything up to the target index, otherwise empty tuple
-                initial_slice = self.classifications[: classification_index[0]] if len(self.classifications) > 0 else ()
-                print(initial_slice)
-                # get everything after the target index, otherwise empty tuple
-                final_slice = self.classifications[classification_index[0] + 1 :] if len(self.classifications) > (classification_index[0] + 1) else ()
-                print(final_slice)
-
-                rebuild1 = (initial_slice + new_classification_index) if initial_slice != () else ((new_classification_index),)
-                rebuild2 = rebuild1 + (final_slice,) if final_slice != () else rebuild1
-                pprint(rebuild2)
-                return InclusiveClassifier(
-                    target_type = self.target_type,
-                    taxonomy = self.taxonomy,
-                    classified_instances = self.classified_instances,
-                    classifications = rebuild2,
-                )
-        except IndexError: # Catches wrong Taxonomic items for this classification structure
-            print("wrong taxo check")
+        taxonomy_index = self.taxonomy.get_index(taxonomic_item)
+        position = instance_index[0]
+        classification = self.classifications[position]
+        if not taxonomy_index or taxonomy_index[0] not in classification: # Catches taxonomic items not classifying the instance
             return self
+        return self._with_classification(position, tuple(index for index in classification if index != taxonomy_index[0]))
+
+    def _with_classification(self, position: int, classification: tuple[int, ...]):
+        classifier = trusted(InclusiveClassifier,
+            target_type = self.target_type,
+            taxonomy = self.taxonomy,
+            classified_instances = self.classified_instances,
+            classifications = self.classifications.replaced(position, classification),
+        )
+        classifier._instance_index = self._instance_index
+        return classifier
+
+    @instrumented
+    def classify_many(self, pairs: Iterable[tuple[TaxonomicItem, Any]]):
+        # applies the protections of classify to every (taxonomic_item, classification_target) pair, in order
+        # returns the new classifier, and the rejected pairs with the reason of their rejection
+        pairs = tuple(pairs)
+        item_indices = self.taxonomy.get_item_indices()
+        taxonomy_indices = tuple(item_indices.get(_item_key(taxonomic_item)) for taxonomic_item, _ in pairs)
+        instance_index = self.get_instance_index()
+        length = len(self.classified_instances)
+        # classification tuples of instances classified before the batch are replaced at the end, new ones appended
+        instances, updated, classifications, rejected = [], {}, [], []
+        tracer = _classify_tracer
+        for pair, taxonomy_index in zip(pairs, taxonomy_indices):
+            start = perf_counter() if tracer is not None else 0.0
+            classification_target = pair[1]
+            if not isinstance(classification_target, self.target_type):
+                event = CLASSIFICATION.TYPE_REJECT
+                rejected.append((pair, event))
+            elif taxonomy_index is None:
+                event = CLASSIFICATION.TAXONOMY_REJECT
+                rejected.append((pair, event))
+            else:
+                position = instance_index.find(classification_target, length)
+                if position is None:
+                    # a first classification of the instance
+                    event = CLASSIFICATION.NEW
+                    instance_index = instance_index.appended(length, classification_target)
+                    length += 1
+                    instances.append(classification_target)
+                    classifications.append((taxonomy_index,))
+                elif position >= len(self.classified_instances):
+                    # a subsequent classification of an instance first classified in this batch
+                    position -= len(self.classified_instances)
+                    if taxonomy_index in classifications[position]:
+                        event = CLASSIFICATION.DUPLICATE_REJECT
+                        rejected.append((pair, event))
+                    else:
+                        event = CLASSIFICATION.APPEND
+                        classifications[position] = classifications[position] + (taxonomy_index,)
+                else:
+                    # a subsequent classification, extending the classification tuple of the instance
+                    classification = updated.get(position, self.classifications[position])
+                    if taxonomy_index in classification:
+                        event = CLASSIFICATION.DUPLICATE_REJECT
+                        rejected.append((pair, event))
+                    else:
+                        event = CLASSIFICATION.APPEND
+                        updated[position] = classification + (taxonomy_index,)
+            if tracer is not None:
+                tracer(event, pair[0], classification_target, perf_counter() - start)
+        if len(rejected) == len(pairs):
+            return self, tuple(rejected)
+        vector = self.classifications
+        for position, classification in updated.items():
+            vector = vector.replaced(position, classification)
+        classifier = trusted(InclusiveClassifier,
+            target_type = self.target_type,
+            taxonomy = self.taxonomy,
+            classified_instances = self.classified_instances.extended(instances),
+            classifications = vector.extended(classifications),
+        )
+        classifier._instance_index = instance_index
+        return classifier, tuple(rejected)
 
+@instrumented
 def newInclusiveClassification(target_type: Type, taxonomy: Taxonomy):
     return InclusiveClassifier(
         target_type = target_type,
@@ -0,0 +1,42 @@
+"""
+Switches between trusted and fully validated construction of the models which the library builds from its own, already validated, data.
+
+The helpers in taxonomy.py and composition.py validate the new element of a mutation (the delta) themselves,
+and then assemble the new model without re-validating the elements it shares with the previous version.
+Full validation re-runs every field and root validator on each rebuild, and is meant for debugging.
+It is switched on with set_full_validation, the full_validation context manager, or the SIMULATION_FULL_VALIDATION environment variable.
+"""
+import os
+from contextlib import contextmanager
+from typing import Type, TypeVar
+from pydantic import BaseModel
+
+
+Model = TypeVar('Model', bound=BaseModel)
+
+_full_validation = os.environ.get('SIMULATION_FULL_VALIDATION', '').lower() in ('1', 'true', 'yes')
+
+
+def set_full_validation(enabled: bool):
+    global _full_validation
+    _full_validation = enabled
+
+
+def full_validation_enabled():
+    return _full_validation
+
+
+@contextmanager
+def full_validation(enabled: bool = True):
+    previous = _full_validation
+    set_full_validation(enabled)
+    try:
+        yield
+    finally:
+        set_full_validation(previous)
+
+
+def trusted(model: Type[Model], **values) -> Model:
+    if _full_validation:
+        return model(**values)
+    return model.construct(**values)
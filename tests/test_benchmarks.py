@@ -0,0 +1,29 @@
+import unittest
+
+from benchmarks.synthetic import synthetic_tree, synthetic_taxonomy, synthetic_domain
+from benchmarks.run import run_benchmarks, compare, BENCHMARKS
+
+
+class TestBenchmarks(unittest.TestCase):
+
+
+    def test_synthetic_tree(self):
+        self.assertEqual(synthetic_tree(10, branching = 2, depth = 2), [-1, -1, 0, 0, 1, 1, 2, 2, 3, 3])
+        self.assertEqual(synthetic_tree(3, branching = 2, depth = 0), [-1, -1, -1])
+
+    def test_synthetic_structures(self):
+        taxonomy = synthetic_taxonomy(50, branching = 3, depth = 2)
+        self.assertEqual(taxonomy.items_count, 50)
+        self.assertEqual(taxonomy.first_tier_items_count, 4)
+        domain = synthetic_domain(50, branching = 3, depth = 2, materials = 2)
+        self.assertEqual(len(domain.things), 50)
+        self.assertEqual(len(domain.compositions), 46)
+        self.assertEqual(len(domain.embodiments), 25)
+
+    def test_run(self):
+        results = run_benchmarks([20, 40], operations = 5, repeat = 1)
+        self.assertEqual({result['benchmark'] for result in results['results']}, set(BENCHMARKS))
+        self.assertEqual(len(results['scaling']), len(BENCHMARKS))
+        slower = {'results': [dict(result, seconds_per_operation = result['seconds_per_operation'] * 3) for result in results['results']]}
+        self.assertEqual(len(compare(slower, results, threshold = 2)), len(results['results']))
+        self.assertEqual(compare(results, slower, threshold = 2), [])
@@ -0,0 +1,44 @@
+import unittest
+
+from src.composition import buildDomain, addThing, addOperation, Thing
+from src.columnar import numpy, edgeIds, findEdges, countDegrees, joinEdges
+
+
+@unittest.skipUnless(numpy, 'numpy is not installed')
+class TestColumnar(unittest.TestCase):
+
+
+    def setUp(self):
+        self.domain, _ = buildDomain(
+            things = ("truck", "van", "wheel", "axle", "cargo", "parcel", "fuel", "trailer"),
+            systems = ("road",),
+            compositions = (("truck", "wheel"), ("truck", "axle"), ("van", "trailer")),
+            provenances = (("cargo", "truck"), ("parcel", "van"), ("parcel", "truck"), ("cargo", "trailer")),
+            operations = (("truck", "fuel"), ("van", "fuel"), ("truck", "wheel")),
+            passivities = (("road", "truck", "van"),),
+        )
+
+    def test_edge_ids(self):
+        self.assertEqual(edgeIds(self.domain, 'compositions', 'by').tolist(), [2, 3, 7])
+        self.assertEqual(edgeIds(self.domain, 'influences', 'system').tolist(), [0])
+
+    def test_find_edges(self):
+        fuel = Thing(name = "fuel")
+        self.assertEqual(findEdges(self.domain, 'operations', by = fuel).tolist(), [0, 1])
+        self.assertEqual(findEdges(self.domain, 'operations', of = Thing(name = "truck"), by = fuel).tolist(), [0])
+        self.assertEqual(findEdges(self.domain, 'operations', by = Thing(name = "coal")).tolist(), [])
+        # the same answer whether the column was built before or after the node was added
+        coal = Thing(name = "coal")
+        domain = addOperation(self.domain, of = Thing(name = "van"), by = coal)
+        self.assertEqual(edgeIds(domain, 'operations', 'by').tolist(), [6, 6, 2, -1])
+        self.assertEqual(findEdges(addThing(domain, "coal"), 'operations', by = coal).tolist(), [3])
+
+    def test_count_degrees(self):
+        self.assertEqual(countDegrees(self.domain, 'compositions', 'of').tolist(), [2, 1, 0, 0, 0, 0, 0, 0])
+
+    def test_join_edges(self):
+        provenances, operations = joinEdges(self.domain, 'provenances', 'operations')
+        pairs = list(zip(provenances.tolist(), operations.tolist()))
+        self.assertEqual(pairs, [(0, 0), (0, 2), (1, 1), (2, 0), (2, 2)])
+        for provenance, operation in pairs:
+            self.assertEqual(self.domain.provenances[provenance].by, self.domain.operations[operation].of)
@@ -0,0 +1,343 @@
+import json
+import unittest
+
+from src.composition import newDomain, addThing, addMaterial, addSystem, addProvenance, addOperation, addPassiveInfluence, addActiveInfluence, composeThing, embodyThing, buildDomain, deriveCorrespondances, Domain, Thing, Composition, GRAPH, REJECTION
+from src.validation import full_validation
+
+
+def build_domain():
+    d = newDomain()
+    for name in ("truck", "wheel", "cargo", "fuel"):
+        d = addThing(d, name)
+    d = addMaterial(d, "steel")
+    d = addSystem(d, "road")
+    truck, wheel, cargo, fuel = d.things
+    d = composeThing(d, of = truck, by = wheel)
+    d = embodyThing(d, of = wheel, by = d.materials[0])
+    d = addProvenance(d, of = cargo, by = truck)
+    d = addOperation(d, of = truck, by = fuel)
+    d = addPassiveInfluence(d, system = d.systems[0], of = truck, by = wheel)
+    d = addActiveInfluence(d, system = d.systems[0], of = truck, by = cargo, operations = [d.operations[0]])
+    return d
+
+
+class TestDomain(unittest.TestCase):
+
+
+    def setUp(self):
+        self.domain = build_domain()
+        self.truck, self.wheel, self.cargo, self.fuel = self.domain.things
+
+    def test_state(self):
+        self.assertEqual(len(self.domain.things), 4)
+        self.assertEqual(len(self.domain.materials), 1)
+        self.assertEqual(len(self.domain.systems), 1)
+        self.assertEqual(len(self.domain.compositions), 1)
+        self.assertEqual(len(self.domain.embodiments), 1)
+        self.assertEqual(self.domain.materialisation, (self.wheel,))
+        self.assertEqual(len(self.domain.provenances), 1)
+        self.assertEqual(len(self.domain.operations), 1)
+        self.assertEqual(len(self.domain.influences), 2)
+
+    def test_structural_sharing(self):
+        d2 = addThing(self.domain, "trailer")
+        self.assertEqual(d2.things[-1], Thing(name = "trailer"))
+        self.assertEqual(self.domain.things, (self.truck, self.wheel, self.cargo, self.fuel))
+        self.assertIs(d2.compositions, self.domain.compositions)
+        self.assertIs(d2.influences, self.domain.influences)
+        self.assertEqual(Domain.parse_raw(d2.json()), d2)
+
+    def test_parents(self):
+        d2 = addThing(self.domain, "hub")
+        hub = d2.things[-1]
+        d3 = composeThing(d2, of = self.wheel, by = hub)
+        self.assertEqual(d3.get_parent(hub), (self.wheel,))
+        self.assertEqual(d3.get_parent(self.truck), ())
+        self.assertEqual(d3.get_path_to_root(hub), (hub, self.wheel, self.truck))
+        self.assertEqual(d3.get_depth(hub), (2,))
+        self.assertEqual(d3.get_depth(self.truck), (0,))
+        self.assertEqual(d3.get_depth(Thing(name = "trailer")), ())
+        # earlier versions do not see the later things and compositions
+        self.assertFalse(self.domain.has_thing(hub))
+        self.assertEqual(d2.get_parent(hub), ())
+        # a version branching off an earlier one keeps its own indexes
+        d4 = composeThing(d2, of = self.cargo, by = hub)
+        self.assertEqual(d4.get_parent(hub), (self.cargo,))
+        self.assertEqual(d3.get_parent(hub), (self.wheel,))
+
+    def test_traversal(self):
+        d2 = addThing(addThing(self.domain, "hub"), "tyre")
+        hub, tyre = d2.things[-2:]
+        d2 = composeThing(d2, of = self.wheel, by = hub)
+        d2 = composeThing(d2, of = self.truck, by = tyre)
+        d2 = embodyThing(d2, of = hub, by = d2.materials[0])
+        self.assertEqual(d2.get_children(self.truck), (self.wheel, tyre))
+        self.assertEqual(d2.get_children(tyre), ())
+        self.assertEqual(d2.get_decendents(self.truck), (self.wheel, hub, tyre))
+        self.assertEqual(d2.get_decendents(), d2.things)
+        self.assertEqual(d2.get_subtree_size(self.truck), 4)
+        self.assertEqual(d2.get_subtree_size(Thing(name = "trailer")), 0)
+        weights = {"truck": 1000, "wheel": 20, "hub": 5, "tyre": 10}
+        self.assertEqual(d2.get_rollup(self.wheel, lambda thing: weights[thing.name]), 25)
+        self.assertEqual(d2.get_bill_of_materials(self.truck), ((d2.materials[0], 2),))
+        self.assertEqual(self.domain.get_children(self.truck), (self.wheel,))
+
+    def test_guards(self):
+        # a thing of another domain, self-composition and a second parent are all refused
+        self.assertIs(composeThing(self.domain, of = self.truck, by = Thing(name = "trailer")), self.domain)
+        self.assertIs(composeThing(self.domain, of = self.truck, by = self.truck), self.domain)
+        self.assertIs(composeThing(self.domain, of = self.cargo, by = self.wheel), self.domain)
+        self.assertIs(embodyThing(self.domain, of = self.wheel, by = self.domain.materials[0]), self.domain)
+
+    def test_cyclic_traversal(self):
+        # a domain validated from data holding a cycle of compositions, which the mutators would refuse
+        a, b = Thing(name = "a"), Thing(name = "b")
+        domain = Domain(things = (a, b), compositions = (Composition(of = a, by = b), Composition(of = b, by = a)))
+        self.assertEqual(domain.get_decendents(a), (b,))
+        self.assertEqual(domain.get_subtree_size(a), 2)
+        self.assertEqual(domain.get_rollup(b, lambda thing: 1), 2)
+        self.assertEqual(domain.get_bill_of_materials(a), ())
+        self.assertEqual(domain.get_path_to_root(a), (a, b))
+
+    def test_cycles(self):
+        # a thing composing one of its ancestors is refused, so that the compositions stay a tree
+        self.assertIs(composeThing(self.domain, of = self.wheel, by = self.truck), self.domain)
+        d2 = composeThing(self.domain, of = self.wheel, by = self.cargo)
+        self.assertIs(composeThing(d2, of = self.cargo, by = self.truck), d2)
+        self.assertEqual(d2.get_path_to_root(self.cargo), (self.cargo, self.wheel, self.truck))
+        domain, rejected = buildDomain(things = ("a", "b", "c"), compositions = (("a", "b"), ("b", "a"), ("b", "c"), ("c", "a")))
+        self.assertEqual([(row, reason) for _, row, reason in rejected], [(("b", "a"), REJECTION.CYCLE), (("c", "a"), REJECTION.CYCLE)])
+        _, rejected = buildDomain(compositions = (("cargo", "truck"),), domain = d2)
+        self.assertEqual([reason for _, _, reason in rejected], [REJECTION.CYCLE])
+        with d2.transaction() as tx:
+            hub = tx.addThing("hub")
+            tx.composeThing(of = self.cargo, by = hub)
+            self.assertIsNone(tx.composeThing(of = hub, by = self.truck))
+        self.assertEqual(tx.rejected, [(GRAPH.COMPOSITION, (hub, self.truck), REJECTION.CYCLE)])
+
+    def test_interning(self):
+        self.assertEqual(self.domain.get_node_id(GRAPH.THING, Thing(name = "cargo")), (2,))
+        self.assertEqual(self.domain.get_node_id(GRAPH.THING, Thing(name = "trailer")), ())
+        self.assertIs(self.domain.intern(GRAPH.THING, Thing(name = "cargo")), self.cargo)
+        # relationships reference the domain's own nodes rather than copies of them
+        self.assertIs(self.domain.compositions[0].by, self.wheel)
+        self.assertIs(self.domain.embodiments[0].by, self.domain.materials[0])
+        self.assertIs(self.domain.provenances[0].of, self.cargo)
+        self.assertIs(self.domain.influences[0].system, self.domain.systems[0])
+        self.assertIs(self.domain.influences[1].by, self.cargo)
+        d2 = addProvenance(self.domain, of = Thing(name = "fuel"), by = Thing(name = "truck"))
+        self.assertIs(d2.provenances[-1].of, self.fuel)
+
+    def test_edge_ids(self):
+        self.assertEqual(list(self.domain.get_edge_ids('compositions', 'of')), [0])
+        self.assertEqual(list(self.domain.get_edge_ids('influences', 'by')), [1, 2])
+        d2 = addThing(self.domain, "hub")
+        d3 = composeThing(d2, of = self.wheel, by = d2.things[-1])
+        d4 = addProvenance(d3, of = self.fuel, by = Thing(name = "trailer"))
+        self.assertEqual(list(d4.get_edge_ids('compositions', 'by')), [1, 4])
+        self.assertEqual(list(d4.get_edge_ids('provenances', 'by')), [0, -1])
+        # a node added later resolves the relationships referencing it, as in a column built from the later version
+        d6 = addThing(d4, "trailer")
+        self.assertEqual(list(d6.get_edge_ids('provenances', 'by')), [0, 5])
+        self.assertEqual(list(Domain(**dict(d6)).get_edge_ids('provenances', 'by')), [0, 5])
+        self.assertEqual(list(d4.get_edge_ids('provenances', 'by')), [0, -1])
+        # a branch from an older version leaves the later versions intact
+        d5 = composeThing(d2, of = self.cargo, by = d2.things[-1])
+        self.assertEqual(list(d5.get_edge_ids('compositions', 'of')), [0, 2])
+        self.assertEqual(list(d4.get_edge_ids('compositions', 'of')), [0, 1])
+        self.assertEqual(list(self.domain.get_edge_ids('compositions', 'of')), [0])
+
+    def test_influence_indexes(self):
+        road = self.domain.systems[0]
+        passive, active = self.domain.influences
+        self.assertEqual(self.domain.get_system_influences(road), (passive, active))
+        self.assertEqual(self.domain.get_system_influences(road, GRAPH.ACTIVITY), (active,))
+        self.assertEqual(self.domain.get_influences_of(self.truck, GRAPH.PASSIVITY), (passive,))
+        self.assertEqual(self.domain.get_influences_by(self.cargo), (active,))
+        self.assertEqual(self.domain.get_influences_by(self.fuel), ())
+        d2 = addPassiveInfluence(self.domain, system = road, of = self.fuel, by = self.cargo)
+        self.assertEqual(d2.get_influences_by(self.cargo), (active, d2.influences[-1]))
+        self.assertEqual(self.domain.get_influences_by(self.cargo), (active,))
+
+    def test_full_validation(self):
+        with full_validation():
+            validated = build_domain()
+        self.assertEqual(validated, self.domain)
+
+
+class TestBuildDomain(unittest.TestCase):
+
+
+    def test_matches_mutators(self):
+        domain, rejected = buildDomain(
+            things = ("truck", "wheel", "cargo", "fuel"),
+            materials = ("steel",),
+            systems = ("road",),
+            compositions = (("truck", "wheel"),),
+            embodiments = (("wheel", "steel"),),
+            provenances = (("cargo", "truck"),),
+            operations = (("truck", "fuel"),),
+            passivities = (("road", "truck", "wheel"),),
+            activities = (("road", "truck", "cargo", (("truck", "fuel"),)),),
+        )
+        self.assertEqual(rejected, ())
+        self.assertEqual(domain, build_domain())
+
+    def test_rejections(self):
+        domain, rejected = buildDomain(
+            things = ("truck", "wheel", "cargo", "truck"),
+            materials = ("steel",),
+            compositions = (("truck", "wheel"), ("cargo", "wheel"), ("cargo", "cargo"), ("cargo", "trailer")),
+            embodiments = (("wheel", "steel"), ("wheel", "steel")),
+            provenances = (("cargo", "truck"),),
+            operations = (("truck", "cargo"), ("wheel", "cargo")),
+            correspondances = (
+                (("cargo", "truck"), ("truck", "cargo")),
+                (("cargo", "truck"), ("wheel", "cargo")),
+                (("truck", "cargo"), ("truck", "cargo")),
+            ),
+        )
+        self.assertEqual([(element, reason) for element, _, reason in rejected], [
+            (GRAPH.THING, REJECTION.DUPLICATE_NODE),
+            (GRAPH.COMPOSITION, REJECTION.MANY_PARENTS),
+            (GRAPH.COMPOSITION, REJECTION.SELF_LOOP),
+            (GRAPH.COMPOSITION, REJECTION.UNKNOWN_NODE),
+            (GRAPH.EMBODIMENT, REJECTION.EMBODIED),
+            (GRAPH.CORRESPONDANCE, REJECTION.MISMATCH),
+            (GRAPH.CORRESPONDANCE, REJECTION.UNKNOWN_RELATIONSHIP),
+        ])
+        self.assertEqual(len(domain.things), 3)
+        self.assertEqual(len(domain.correspondances), 1)
+        self.assertEqual(domain.get_children(domain.things[0]), (domain.things[1],))
+
+    def test_extends_domain(self):
+        domain = build_domain()
+        self.assertEqual(domain.get_children(domain.things[0]), (domain.things[1],))
+        extended, rejected = buildDomain(things = ("hub", "wheel"), compositions = (("wheel", "hub"),), domain = domain)
+        self.assertEqual(rejected, ((GRAPH.THING, "wheel", REJECTION.DUPLICATE_NODE),))
+        self.assertEqual(extended.get_decendents(domain.things[0]), (domain.things[1], Thing(name = "hub")))
+        # rows referencing the relationships of the domain, and checked against its compositions and embodiments
+        extended, rejected = buildDomain(
+            compositions = (("cargo", "wheel"),),
+            embodiments = (("wheel", "steel"),),
+            correspondances = ((("cargo", "truck"), ("truck", "fuel")),),
+            activities = (("road", "truck", "wheel", (("truck", "fuel"),)),),
+            domain = domain,
+        )
+        self.assertEqual([reason for _, _, reason in rejected], [REJECTION.MANY_PARENTS, REJECTION.EMBODIED])
+        self.assertIs(extended.correspondances[0].provenance, domain.provenances[0])
+        self.assertIs(extended.influences[-1].containing.operations[0], domain.operations[0])
+
+    def test_list_rows(self):
+        # rows as json gives them
+        rows = json.loads(json.dumps({
+            'compositions': [["truck", "wheel"]],
+            'embodiments': [["wheel", "steel"]],
+            'provenances': [["cargo", "truck"]],
+            'operations': [["truck", "fuel"]],
+            'passivities': [["road", "truck", "wheel"]],
+            'activities': [["road", "truck", "cargo", [["truck", "fuel"]]], ["road", "truck", "cargo", [["truck", "cargo"]]]],
+        }))
+        domain, rejected = buildDomain(things = ("truck", "wheel", "cargo", "fuel"), materials = ("steel",), systems = ("road",), **rows)
+        self.assertEqual(rejected, ((GRAPH.ACTIVITY, ("road", "truck", "cargo", (("truck", "cargo"),)), REJECTION.UNKNOWN_RELATIONSHIP),))
+        self.assertEqual(domain, build_domain())
+
+
+class TestDeriveCorrespondances(unittest.TestCase):
+
+
+    def setUp(self):
+        self.domain, _ = buildDomain(
+            things = ("truck", "van", "cargo", "parcel", "fuel"),
+            provenances = (("cargo", "truck"), ("parcel", "van")),
+            operations = (("truck", "fuel"), ("van", "fuel")),
+            correspondances = ((("parcel", "van"), ("van", "fuel")),),
+        )
+
+    def correspondance_keys(self, domain):
+        return [
+            ((c.provenance.of.name, c.provenance.by.name), (c.operation.of.name, c.operation.by.name))
+            for c in domain.correspondances
+        ]
+
+    def test_derive(self):
+        derived = deriveCorrespondances(self.domain)
+        # the hand made correspondance is not added twice
+        self.assertEqual(self.correspondance_keys(derived), [
+            (("parcel", "van"), ("van", "fuel")),
+            (("cargo", "truck"), ("truck", "fuel")),
+        ])
+        self.assertIs(deriveCorrespondances(derived), derived)
+        # a join which adds nothing moves on in a new version, leaving the domain given as it was
+        bare = addOperation(derived, of = derived.things[-1], by = derived.things[0])
+        joined = deriveCorrespondances(bare)
+        self.assertEqual(joined, bare)
+        self.assertEqual((bare._derived, joined._derived), ((2, 2), (2, 3)))
+        self.assertEqual(len(self.domain.correspondances), 1)
+
+    def test_incremental(self):
+        derived = deriveCorrespondances(self.domain)
+        truck, van, cargo, parcel, fuel = derived.things
+        extended = addOperation(derived, of = truck, by = cargo)
+        extended = addProvenance(extended, of = parcel, by = truck)
+        extended = deriveCorrespondances(extended)
+        self.assertEqual(self.correspondance_keys(extended)[2:], [
+            (("parcel", "truck"), ("truck", "fuel")),
+            (("parcel", "truck"), ("truck", "cargo")),
+            (("cargo", "truck"), ("truck", "cargo")),
+        ])
+        self.assertEqual(len(derived.correspondances), 2)
+
+
+class TestDomainTransaction(unittest.TestCase):
+
+
+    def test_matches_mutators(self):
+        with newDomain().transaction() as tx:
+            truck, wheel, cargo, fuel = (tx.addThing(name) for name in ("truck", "wheel", "cargo", "fuel"))
+            steel = tx.addMaterial("steel")
+            road = tx.addSystem("road")
+            tx.composeThing(of = truck, by = wheel)
+            tx.embodyThing(of = wheel, by = steel)
+            tx.addProvenance(of = cargo, by = truck)
+            operation = tx.addOperation(of = truck, by = fuel)
+            tx.addPassiveInfluence(system = road, of = truck, by = wheel)
+            tx.addActiveInfluence(system = road, of = truck, by = cargo, operations = [operation])
+        self.assertEqual(tx.result, build_domain())
+        self.assertEqual(tx.rejected, [])
+        self.assertIs(tx.result.compositions[0].by, tx.result.things[1])
+
+    def test_rejected(self):
+        domain = build_domain()
+        truck, wheel, cargo, fuel = domain.things
+        with domain.transaction() as tx:
+            hub = tx.addThing("hub")
+            self.assertIsNotNone(tx.composeThing(of = wheel, by = hub))
+            self.assertIsNone(tx.composeThing(of = cargo, by = hub))
+            self.assertIsNone(tx.composeThing(of = cargo, by = wheel))
+            self.assertIsNone(tx.composeThing(of = fuel, by = fuel))
+            self.assertIsNone(tx.composeThing(of = fuel, by = Thing(name = "trailer")))
+            self.assertIsNone(tx.embodyThing(of = wheel, by = domain.materials[0]))
+        self.assertEqual([reason for _, _, reason in tx.rejected], [
+            REJECTION.MANY_PARENTS, REJECTION.MANY_PARENTS, REJECTION.SELF_LOOP, REJECTION.UNKNOWN_NODE, REJECTION.EMBODIED,
+        ])
+        self.assertEqual(tx.result.get_path_to_root(hub), (hub, wheel, truck))
+        self.assertEqual(len(domain.compositions), 1)
+
+    def test_rollback(self):
+        domain = build_domain()
+        with self.assertRaises(ValueError):
+            with domain.transaction() as tx:
+                tx.addThing("hub")
+                tx.addProvenance(of = domain.things[0], by = domain.things[0])
+        self.assertIsNone(tx.result)
+        self.assertEqual(len(domain.things), 4)
+        # the rejections of the abandoned mutations go with them
+        tx = domain.transaction()
+        tx.composeThing(of = domain.things[0], by = domain.things[0])
+        tx.rollback()
+        self.assertEqual(tx.rejected, [])
+        with self.assertRaises(RuntimeError):
+            tx.commit()
+            tx.commit()
+        self.assertIs(tx.result, domain)
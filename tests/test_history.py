@@ -0,0 +1,48 @@
+import unittest
+
+from src.taxonomy import create_taxonomy, add_taxonomic_item
+from src.composition import newDomain, addThing, composeThing, buildDomain, Thing
+from src.history import History
+
+
+class TestHistory(unittest.TestCase):
+
+
+    def test_domain(self):
+        history = History(newDomain(), checkpoint_interval = 2)
+        for name in ("truck", "wheel", "cargo"):
+            history.apply(addThing, name)
+        truck, wheel, cargo = history.latest.things
+        history.apply(composeThing, of = truck, by = wheel)
+        domain, rejected = history.apply(buildDomain, things = ("fuel", "truck"))
+        self.assertIs(history.latest, domain)
+        self.assertEqual(len(rejected), 1)
+        self.assertEqual(len(history), 6)
+        for number, things in enumerate((0, 1, 2, 3, 3, 4)):
+            self.assertEqual(len(history.version(number).things), things)
+        self.assertEqual(history.version(4), history.version(5).copy(update = {'things': history.version(5).things[:3]}))
+        added, removed = history.diff(1, 4)
+        self.assertEqual(added, {'things': (wheel, cargo), 'compositions': (history.latest.compositions[0],)})
+        self.assertEqual(removed, {})
+        self.assertEqual(history.diff(5, 3), ({}, {'things': (Thing(name = "fuel"),), 'compositions': (history.latest.compositions[0],)}))
+        with self.assertRaises(IndexError):
+            history.version(6)
+        # the rows given positionally too, and the version replayed through buildDomain from the checkpoint before it
+        history.apply(buildDomain, ("bus",))
+        self.assertEqual(history.version(5), domain)
+        self.assertEqual(len(history.latest.things), 5)
+
+    def test_taxonomy(self):
+        history = History(create_taxonomy(name = "fleet"), checkpoint_interval = 3)
+        vehicle = history.apply(add_taxonomic_item, name = "vehicle").items[0]
+        for name in ("truck", "van", "bus"):
+            history.apply(add_taxonomic_item, name = name, parent = vehicle)
+        self.assertEqual(history.version(2), add_taxonomic_item(add_taxonomic_item(create_taxonomy(name = "fleet"), "vehicle"), "truck", vehicle))
+        # taxonomy versions are prefixes of the latest one rather than checkpointed copies
+        self.assertEqual(history._checkpoints, {})
+        self.assertEqual(history.version(0), create_taxonomy(name = "fleet"))
+        self.assertEqual(history.version(3).children_map, ((1, 2), (), ()))
+        self.assertEqual(history.version(3).get_children(vehicle), history.latest.get_children(vehicle)[:2])
+        added, _ = history.diff(2, 4)
+        self.assertEqual([item.name for item in added['items']], ["van", "bus"])
+        self.assertEqual(len(added['subsequent_tier_binds']), 2)
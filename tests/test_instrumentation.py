@@ -0,0 +1,42 @@
+import unittest
+
+from src.instrumentation import Instrumentation, instrumenting, set_instrumentation
+from src.validation import full_validation
+from src.taxonomy import create_taxonomy, add_taxonomic_item
+from src.composition import newDomain, addThing, composeThing
+
+
+class TestInstrumentation(unittest.TestCase):
+
+
+    def test_disabled(self):
+        instrumentation = Instrumentation()
+        previous = set_instrumentation(instrumentation)
+        set_instrumentation(previous)
+        addThing(newDomain(), "truck")
+        self.assertEqual(instrumentation.as_dict(), {})
+
+    def test_counts(self):
+        with instrumenting() as instrumentation:
+            domain = addThing(addThing(newDomain(), "truck"), "wheel")
+            composeThing(domain, of = domain.things[0], by = domain.things[1])
+        report = instrumentation.as_dict()
+        self.assertEqual(report['addThing']['calls'], 2)
+        self.assertEqual(report['addNode']['calls'], 2)
+        self.assertEqual(report['evolveDomain']['calls'], 3)
+        self.assertGreater(report['composeThing']['seconds'], 0)
+        self.assertEqual(report['composeThing']['sizes']['things'], 2)
+        self.assertEqual(report['addThing']['max_sizes']['things'], 1)
+        # the trusted path runs no validators
+        self.assertNotIn('Composition.composition_loop', report)
+
+    def test_validators(self):
+        with instrumenting() as instrumentation, full_validation():
+            taxonomy = add_taxonomic_item(create_taxonomy(name = "fleet"), "vehicle")
+            domain = addThing(addThing(newDomain(), "truck"), "wheel")
+            composeThing(domain, of = domain.things[0], by = domain.things[1])
+        report = instrumentation.as_dict()
+        self.assertGreaterEqual(report['Taxonomy.state_check']['calls'], 2)
+        self.assertEqual(report['Composition.composition_loop']['calls'], 1)
+        instrumentation.reset()
+        self.assertEqual(instrumentation.as_dict(), {})
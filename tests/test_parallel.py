@@ -0,0 +1,68 @@
+import unittest
+
+from src.taxonomy import create_taxonomy, add_taxonomic_items, newExclusiveClassification, newInclusiveClassification, TaxonomicItem, CLASSIFICATION
+from src.parallel import classify_parallel
+
+
+def size_rule(instance: int):
+    # small numbers are vans, large ones trucks, negative ones are left out and multiples of 7 go to an unknown item
+    if instance < 0:
+        return None
+    if instance % 7 == 0:
+        return TaxonomicItem(name = "boat")
+    return TaxonomicItem(name = "van" if instance < 50 else "truck")
+
+
+class TestClassifyParallel(unittest.TestCase):
+
+
+    def setUp(self):
+        vehicle = TaxonomicItem(name = "vehicle")
+        self.taxonomy = add_taxonomic_items(create_taxonomy(name = "fleet"), (
+            ("vehicle", None),
+            ("truck", vehicle),
+            ("van", vehicle),
+        ))
+        # repeated instances in other chunks, so that the exclusivity conflicts cross the shards
+        self.instances = list(range(-5, 100)) + [10, 60, 3]
+
+    def sequential(self, new_classification):
+        pairs = [(size_rule(instance), instance) for instance in self.instances if size_rule(instance) is not None]
+        return new_classification(target_type = int, taxonomy = self.taxonomy).classify_many(pairs)
+
+    def assertSameClassification(self, first, second):
+        self.assertEqual(tuple(first[0].classified_instances), tuple(second[0].classified_instances))
+        self.assertEqual(tuple(first[0].classifications), tuple(second[0].classifications))
+        self.assertEqual(first[1], second[1])
+
+    def test_exclusive(self):
+        expected = self.sequential(newExclusiveClassification)
+        for processes in (1, 3):
+            result = classify_parallel(self.taxonomy, newExclusiveClassification, int, self.instances, size_rule, processes = processes, chunk_size = 10)
+            self.assertSameClassification(result, expected)
+        classifier, rejected = result
+        self.assertEqual(classifier.get_classification_indices(60), (self.taxonomy.get_index(TaxonomicItem(name = "truck"))[0],))
+        self.assertNotIn(-1, tuple(classifier.classified_instances))
+        self.assertEqual(
+            {reason for _, reason in rejected},
+            {CLASSIFICATION.TAXONOMY_REJECT, CLASSIFICATION.EXCLUSIVITY_REJECT},
+        )
+        self.assertIn(((TaxonomicItem(name = "van"), 10), CLASSIFICATION.EXCLUSIVITY_REJECT), rejected)
+
+    def test_inclusive(self):
+        expected = self.sequential(newInclusiveClassification)
+        result = classify_parallel(self.taxonomy, newInclusiveClassification, int, self.instances, size_rule, processes = 2, chunk_size = 25)
+        self.assertSameClassification(result, expected)
+        van = self.taxonomy.get_index(TaxonomicItem(name = "van"))[0]
+        # a repeated classification by the same item is rejected rather than repeated in the classification tuple
+        self.assertEqual(result[0].get_classification_indices(10), ((van,),))
+        self.assertIn(((TaxonomicItem(name = "van"), 10), CLASSIFICATION.DUPLICATE_REJECT), result[1])
+
+    def test_empty(self):
+        classifier, rejected = classify_parallel(self.taxonomy, newExclusiveClassification, int, (), size_rule)
+        self.assertEqual(len(classifier.classified_instances), 0)
+        self.assertEqual(rejected, ())
+
+
+if __name__ == '__main__':
+    unittest.main()
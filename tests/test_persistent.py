@@ -0,0 +1,89 @@
+import unittest
+
+from src.persistent import AppendIndex, AppendMultiIndex, PersistentVector, hash_key
+from src.composition import Thing, Material, newDomain, addThing
+from src.taxonomy import create_taxonomy, add_taxonomic_item, newExclusiveClassification
+
+
+class TestPersistentVector(unittest.TestCase):
+
+
+    def test_append_and_replace(self):
+        for size in (0, 1, 32, 33, 1024, 1057, 40000):
+            values = list(range(size))
+            appended = PersistentVector()
+            for value in values:
+                appended = appended.appended(value)
+            self.assertEqual(appended, PersistentVector(values))
+            self.assertEqual(list(appended), values)
+            self.assertEqual(len(appended), size)
+            if size:
+                replaced = appended.replaced(size // 2, -1)
+                self.assertEqual(replaced[size // 2], -1)
+                self.assertEqual(appended[size // 2], size // 2)
+                self.assertEqual(replaced[:size // 2], tuple(values[:size // 2]))
+
+    def test_sequence_behaviour(self):
+        vector = PersistentVector("abc")
+        self.assertEqual(vector, ("a", "b", "c"))
+        self.assertEqual(vector + ("d",), ["a", "b", "c", "d"])
+        self.assertEqual(vector[1:], ("b", "c"))
+        self.assertEqual(vector.index("c"), 2)
+        self.assertIn("b", vector)
+        self.assertEqual(hash(vector), hash(("a", "b", "c")))
+        with self.assertRaises(IndexError):
+            vector[3]
+        self.assertEqual(("z",) + vector, ("z", "a", "b", "c"))
+        self.assertEqual(["z"] + vector, ["z", "a", "b", "c"])
+
+    def test_model_export(self):
+        # models holding persistent vectors export them as tuples of plain values, and copies share them
+        domain = addThing(newDomain(), "truck")
+        self.assertEqual(domain.dict()['things'], ({'name': "truck"},))
+        self.assertIs(domain.copy().things, domain.things)
+        taxonomy = add_taxonomic_item(create_taxonomy(name = "fleet"), "vehicle")
+        classifier = newExclusiveClassification(target_type = str, taxonomy = taxonomy).classify(taxonomy.items[0], "t1")
+        exported = classifier.dict()
+        self.assertEqual((type(exported['classified_instances']), exported['classifications']), (tuple, (0,)))
+        self.assertEqual(classifier.json(include = {'classified_instances'}), '{"classified_instances": ["t1"]}')
+
+
+class TestAppendIndex(unittest.TestCase):
+
+
+    def test_versions(self):
+        index = AppendIndex(("a", "b"))
+        later = index.appended(2, "c")
+        # a second append to the two item version branches off into its own index
+        branch = index.appended(2, "d")
+        self.assertEqual(later.find("c", 3), 2)
+        self.assertEqual(later.find("d", 3), None)
+        self.assertEqual(branch.find("d", 3), 2)
+        self.assertEqual(branch.find("c", 3), None)
+        self.assertEqual(later.find("c", 2), None)
+        self.assertEqual(later.find(["unhashable"], 3), None)
+        self.assertEqual(later.appended(3, ["unhashable"]).find(["unhashable"], 4), 3)
+
+    def test_models(self):
+        # pydantic models are unhashable, and are indexed by a hashable stand-in rather than scanned
+        index = AppendIndex(Thing(name = str(number)) for number in range(1000))
+        self.assertEqual(index._unhashable, [])
+        self.assertEqual(index.find(Thing(name = "999"), 1000), 999)
+        self.assertEqual(index.find(Thing(name = "999"), 999), None)
+        self.assertEqual(index.find(Material(name = "999"), 1000), None)
+        self.assertEqual(hash_key([Thing(name = "a")]), hash_key([Thing(name = "a")]))
+        self.assertNotEqual(hash_key([Thing(name = "a")]), hash_key((Thing(name = "a"),)))
+
+
+class TestAppendMultiIndex(unittest.TestCase):
+
+
+    def test_versions(self):
+        index = AppendMultiIndex(("a", "b", "a"))
+        later = index.appended(3, "a")
+        branch = index.appended(2, "b")
+        self.assertEqual(later.find_all("a", 4), (0, 2, 3))
+        self.assertEqual(later.find_all("a", 3), (0, 2))
+        self.assertEqual(branch.find_all("a", 3), (0,))
+        self.assertEqual(branch.find_all("b", 3), (1, 2))
+        self.assertEqual(later.find_all("c", 4), ())
@@ -0,0 +1,93 @@
+import io
+import unittest
+
+from src.taxonomy import create_taxonomy, add_taxonomic_items, newExclusiveClassification, TaxonomicItem, CLASSIFICATION
+from src.composition import buildDomain, deriveCorrespondances, GRAPH, REJECTION
+from src.records import (
+    read_csv, write_csv, read_jsonl, write_jsonl, chunked,
+    taxonomy_from_records, taxonomy_records, classify_records, classification_records, domain_from_records, domain_records,
+    TAXONOMY_FIELDS, DOMAIN_FIELDS,
+)
+
+
+class TestRecords(unittest.TestCase):
+
+
+    def setUp(self):
+        vehicle = TaxonomicItem(name = "vehicle")
+        self.taxonomy = add_taxonomic_items(create_taxonomy(name = "fleet"), (
+            ("vehicle", None),
+            ("building", None),
+            ("truck", vehicle),
+            ("van", vehicle),
+        ))
+        domain, _ = buildDomain(
+            things = ("truck", "wheel", "cargo", "fuel"),
+            materials = ("steel",),
+            systems = ("road",),
+            compositions = (("truck", "wheel"),),
+            embodiments = (("wheel", "steel"),),
+            provenances = (("cargo", "truck"),),
+            operations = (("truck", "fuel"),),
+            passivities = (("road", "truck", "wheel"),),
+            activities = (("road", "truck", "cargo", (("truck", "fuel"),)),),
+        )
+        self.domain = deriveCorrespondances(domain)
+
+    def test_chunked(self):
+        self.assertEqual(list(chunked(range(5), 2)), [(0, 1), (2, 3), (4,)])
+
+    def test_taxonomy(self):
+        stream = io.StringIO()
+        write_csv(stream, taxonomy_records(self.taxonomy), TAXONOMY_FIELDS)
+        stream.seek(0)
+        records = list(read_csv(stream)) + [{'name': "tipper", 'parent': "lorry"}]
+        taxonomy, rejected = taxonomy_from_records(create_taxonomy(name = "fleet"), records)
+        self.assertEqual(taxonomy, self.taxonomy)
+        self.assertEqual(rejected, ({'name': "tipper", 'parent': "lorry"},))
+
+    def test_classifications(self):
+        classifier = newExclusiveClassification(target_type = str, taxonomy = self.taxonomy)
+        records = [
+            {'instance': "T-100", 'item': "truck"},
+            {'instance': "V-200", 'item': "van"},
+            {'instance': "T-100", 'item': "van"},
+            {'instance': "B-300", 'item': "bridge"},
+        ]
+        classifier, rejected = classify_records(classifier, records, chunk_size = 3)
+        self.assertEqual(classifier.classified_instances, ("T-100", "V-200"))
+        self.assertEqual(rejected, (
+            (records[2], CLASSIFICATION.EXCLUSIVITY_REJECT),
+            (records[3], CLASSIFICATION.TAXONOMY_REJECT),
+        ))
+        stream = io.StringIO()
+        write_jsonl(stream, classification_records(classifier))
+        stream.seek(0)
+        self.assertEqual(list(read_jsonl(stream)), records[:2])
+
+    def test_domain(self):
+        for write, read in (
+            (lambda stream, records: write_csv(stream, records, DOMAIN_FIELDS), read_csv),
+            (write_jsonl, read_jsonl),
+        ):
+            stream = io.StringIO()
+            write(stream, domain_records(self.domain))
+            stream.seek(0)
+            domain, rejected = domain_from_records(read(stream), chunk_size = 3)
+            self.assertEqual(rejected, ())
+            self.assertEqual(domain, self.domain)
+
+    def test_domain_unknown_elements(self):
+        records = (
+            {'element': "thing", 'name': "truck"},
+            {'element': "influence", 'system': "road", 'of': "truck", 'by': "truck"},
+            {'element': "vehicle", 'name': "van"},
+            {'name': "cargo"},
+        )
+        domain, rejected = domain_from_records(records)
+        self.assertEqual(rejected, (
+            (GRAPH.INFLUENCE, records[1], REJECTION.UNKNOWN_ELEMENT),
+            (None, records[2], REJECTION.UNKNOWN_ELEMENT),
+            (None, records[3], REJECTION.UNKNOWN_ELEMENT),
+        ))
+        self.assertEqual(len(domain.things), 1)
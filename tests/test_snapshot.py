@@ -0,0 +1,77 @@
+import os
+import tempfile
+import unittest
+
+from src.taxonomy import create_taxonomy, add_taxonomic_items, CompactTaxonomy, TaxonomicItem
+from src.composition import buildDomain, deriveCorrespondances
+from src.snapshot import save_taxonomy, load_taxonomy, open_taxonomy, save_domain, load_domain
+from src.validation import full_validation
+
+
+class TestSnapshot(unittest.TestCase):
+
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'snapshot.bin')
+
+    def build_taxonomy(self):
+        vehicle, truck, van = (TaxonomicItem(name = name) for name in ("vehicle", "truck", "van"))
+        return add_taxonomic_items(create_taxonomy(name = "fleet"), (
+            ("vehicle", None),
+            ("building", None),
+            ("truck", vehicle),
+            ("van", vehicle),
+            ("tipper", truck),
+            ("campervan", van),
+        ))
+
+    def build_domain(self):
+        domain, _ = buildDomain(
+            things = ("truck", "wheel", "cargo", "fuel"),
+            materials = ("steel",),
+            systems = ("road",),
+            compositions = (("truck", "wheel"),),
+            embodiments = (("wheel", "steel"),),
+            provenances = (("cargo", "truck"),),
+            operations = (("truck", "fuel"),),
+            passivities = (("road", "truck", "wheel"),),
+            activities = (("road", "truck", "cargo", (("truck", "fuel"),)),),
+        )
+        return deriveCorrespondances(domain)
+
+    def test_taxonomy(self):
+        taxonomy = self.build_taxonomy()
+        save_taxonomy(taxonomy, self.path)
+        self.assertEqual(load_taxonomy(self.path), taxonomy)
+        with full_validation():
+            self.assertEqual(load_taxonomy(self.path), taxonomy)
+
+    def test_open_taxonomy(self):
+        taxonomy = self.build_taxonomy()
+        save_taxonomy(CompactTaxonomy.from_taxonomy(taxonomy), self.path)
+        opened = open_taxonomy(self.path)
+        self.assertEqual(opened.name, "fleet")
+        self.assertEqual(opened.items_count, 6)
+        vehicle = TaxonomicItem(name = "vehicle")
+        self.assertEqual(opened.get_children(vehicle), taxonomy.get_children(vehicle))
+        self.assertEqual(opened.get_decendents(vehicle), taxonomy.get_decendents(vehicle))
+        self.assertEqual(tuple(opened.iter_ancestors(TaxonomicItem(name = "tipper"))), (TaxonomicItem(name = "truck"), vehicle))
+        self.assertEqual(opened.to_taxonomy(), taxonomy)
+
+    def test_domain(self):
+        domain = self.build_domain()
+        save_domain(domain, self.path)
+        loaded = load_domain(self.path)
+        self.assertEqual(loaded, domain)
+        # each node is held once, however many relationships reference it
+        self.assertIs(loaded.compositions[0].of, loaded.things[0])
+        self.assertIs(loaded.correspondances[0].provenance, loaded.provenances[0])
+        with full_validation():
+            self.assertEqual(load_domain(self.path), domain)
+
+    def test_kind(self):
+        save_domain(self.build_domain(), self.path)
+        with self.assertRaises(ValueError):
+            load_taxonomy(self.path)
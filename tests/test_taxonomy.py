@@ -1,6 +1,8 @@
 import unittest
 
-from src.taxonomy import add_taxonomic_item, create_taxonomy, Taxonomy, newExclusiveClassification, newInclusiveClassification
+from src.taxonomy import add_taxonomic_item, add_taxonomic_items, create_taxonomy, CompactTaxonomy, Taxonomy, TaxonomicItem, TaxonomyBuilder, BaseClassifier, ExclusiveClassifier, CLASSIFICATION, classify_tracing, newExclusiveClassification, newInclusiveClassification
+from src.validation import full_validation
+from src.composition import Thing
 from rich.pretty import pprint
 
 
@@ -42,8 +44,8 @@ class TestTaxonomy(unittest.TestCase):
         self.assertEqual(len(self.t2.first_tier_binds), 1)
         self.assertEqual(len(self.t2.subsequent_tiers), 0)
         self.assertEqual(len(self.t2.subsequent_tier_binds), 0)
-        self.assertEqual(self.t2.get_children(), ())
-        self.assertEqual(self.t2.get_index(self.t2.items[0]), self.t2.items.index(self.t2.items[0]))
+        self.assertEqual(self.t2.get_children(), self.t2.items)
+        self.assertEqual(self.t2.get_index(self.t2.items[0]), (self.t2.items.index(self.t2.items[0]),))
         self.assertEqual(self.t2.get_indices(self.t2.items[0]), (self.t2.items.index(self.t2.items[0]),))
 
 
@@ -57,6 +59,132 @@ class TestTaxonomy(unittest.TestCase):
         self.assertEqual(self.t3.get_children(self.t3.items[0])[0], self.t3.items[1])
         self.assertEqual(self.t3.get_decendents(), self.t3.items)
 
+    def test_index_lookup(self):
+        tulip = TaxonomicItem(name="Tulip")
+        self.assertEqual(self.t3.get_index(tulip), (1,))
+        self.assertEqual(self.t3.get_index(TaxonomicItem(name="Cat")), ())
+        self.assertEqual(self.t3.get_indices(tulip, self.t3.items[0]), (1, 0))
+        # a missing target keeps its position, so the indices line up with the targets
+        self.assertEqual(self.t3.get_indices(TaxonomicItem(name="Cat"), tulip), (None, 1))
+        self.assertEqual(self.t3.compact().get_indices(TaxonomicItem(name="Cat"), tulip), (None, 1))
+        # the lazily built index is carried along when the taxonomy is copied into a classifier
+        classifier = newExclusiveClassification(target_type = str, taxonomy = self.t3)
+        self.assertIs(classifier.taxonomy.get_item_indices(), self.t3.get_item_indices())
+
+
+class TestTaxonomyBuilder(unittest.TestCase):
+
+
+    def setUp(self):
+        self.t1 = create_taxonomy(name="Life")
+        self.flora = TaxonomicItem(name="Flora")
+        self.fauna = TaxonomicItem(name="Fauna")
+        self.rows = (
+            ("Flora", None),
+            ("Tulip", self.flora),
+            ("Fauna", None),
+            ("Cat", self.fauna),
+            ("Rose", self.flora),
+        )
+
+    def test_matches_chained_adds(self):
+        chained = self.t1
+        for name, parent in self.rows:
+            chained = add_taxonomic_item(taxonomy = chained, name = name, parent = parent)
+        bulk = add_taxonomic_items(self.t1, self.rows)
+        self.assertEqual(bulk, chained)
+        self.assertEqual(bulk.first_tier, (0, 2))
+        self.assertEqual(bulk.subsequent_tiers, (1, 3, 4))
+        self.assertEqual(bulk.children_map, ((1, 4), (), (3,), (), ()))
+
+    def test_extends_existing_taxonomy(self):
+        t2 = add_taxonomic_items(self.t1, self.rows[:2])
+        t3 = add_taxonomic_items(t2, self.rows[2:])
+        self.assertEqual(t3, add_taxonomic_items(self.t1, self.rows))
+
+    def test_traversal(self):
+        t2 = add_taxonomic_items(self.t1, self.rows + (("Tabby", TaxonomicItem(name="Cat")),))
+        cat = TaxonomicItem(name="Cat")
+        self.assertEqual(t2.get_children(self.flora), (t2.items[1], t2.items[4]))
+        self.assertEqual(t2.get_children(cat), (t2.items[5],))
+        self.assertEqual(t2.get_children(TaxonomicItem(name="Dog")), ())
+        self.assertEqual(t2.get_decendents(self.fauna), (cat, t2.items[5]))
+        self.assertEqual(
+            tuple(item.name for item in t2.iter_decendents()),
+            ("Flora", "Tulip", "Rose", "Fauna", "Cat", "Tabby"),
+        )
+        decendents = t2.iter_decendents(self.flora)
+        self.assertEqual(next(decendents).name, "Tulip")
+        self.assertEqual(tuple(t2.iter_ancestors(t2.items[5])), (cat, self.fauna))
+        self.assertEqual(tuple(t2.iter_ancestors(self.flora)), ())
+
+    def test_first_tier_children(self):
+        t2 = add_taxonomic_items(self.t1, self.rows)
+        self.assertEqual(t2.get_children(), (self.flora, self.fauna))
+
+    def test_loads_taxonomy_without_children_map(self):
+        # taxonomies saved before the children map have none, and tier positions one past their item
+        t2 = add_taxonomic_items(self.t1, self.rows)
+        saved = t2.dict()
+        del saved['children_map']
+        saved['first_tier'], saved['subsequent_tiers'] = (0, 3), (2, 4, 5)
+        self.assertEqual(Taxonomy(**saved), t2)
+        self.assertEqual(Taxonomy.parse_raw(t2.json(exclude = {'children_map'})), t2)
+
+    def test_skips_foreign_parents(self):
+        builder = TaxonomyBuilder(self.t1)
+        self.assertEqual(builder.add("Tulip", parent = self.flora), None)
+        self.assertEqual(builder.add("Flora"), self.flora)
+        t2 = builder.freeze()
+        self.assertEqual(t2.items_count, 1)
+        self.assertEqual(t2.first_tier_items_count, 1)
+
+class TestCompactTaxonomy(unittest.TestCase):
+
+
+    def setUp(self):
+        self.flora = TaxonomicItem(name="Flora")
+        self.fauna = TaxonomicItem(name="Fauna")
+        self.cat = TaxonomicItem(name="Cat")
+        self.rows = (
+            ("Flora", None),
+            ("Tulip", self.flora),
+            ("Fauna", None),
+            ("Cat", self.fauna),
+            ("Rose", self.flora),
+            ("Tabby", self.cat),
+        )
+        self.t1 = add_taxonomic_items(create_taxonomy(name="Life"), self.rows)
+        self.compact = self.t1.compact()
+
+    def test_round_trip(self):
+        self.assertEqual(self.compact.to_taxonomy(), self.t1)
+        self.assertEqual(CompactTaxonomy.from_items(self.t1.taxonomy_head, self.rows).to_taxonomy(), self.t1)
+
+    def test_taxonomy_api(self):
+        self.assertEqual(self.compact.name, self.t1.name)
+        self.assertEqual(self.compact.items_count, self.t1.items_count)
+        self.assertEqual(tuple(self.compact.items), self.t1.items)
+        self.assertEqual(tuple(self.compact.first_tier), self.t1.first_tier)
+        self.assertEqual(tuple(self.compact.subsequent_tiers), self.t1.subsequent_tiers)
+        self.assertEqual(tuple(self.compact.first_tier_binds), self.t1.first_tier_binds)
+        self.assertEqual(tuple(self.compact.subsequent_tier_binds), self.t1.subsequent_tier_binds)
+        self.assertEqual(tuple(self.compact.children_map), self.t1.children_map)
+        self.assertEqual(self.compact.get_index(self.cat), self.t1.get_index(self.cat))
+        self.assertEqual(self.compact.get_indices(self.cat, self.flora), (3, 0))
+        self.assertEqual(self.compact.get_children(self.flora), self.t1.get_children(self.flora))
+        self.assertEqual(self.compact.get_children(), self.t1.get_children())
+        self.assertEqual(self.compact.get_decendents(self.fauna), self.t1.get_decendents(self.fauna))
+        self.assertEqual(tuple(self.compact.iter_decendents()), tuple(self.t1.iter_decendents()))
+        self.assertEqual(tuple(self.compact.iter_ancestors(self.t1.items[5])), (self.cat, self.fauna))
+
+    def test_skips_foreign_parents(self):
+        compact = CompactTaxonomy.from_items(self.t1.taxonomy_head, (("Tulip", self.flora), ("Flora", None)))
+        self.assertEqual(compact.items_count, 1)
+        self.assertEqual(compact.items[0], self.flora)
+        self.assertEqual(compact.items[-1], self.flora)
+
+
 class TestExclusiveClassifier(unittest.TestCase):
 
 
@@ -98,6 +226,78 @@ class TestExclusiveClassifier(unittest.TestCase):
         self.assertEqual(len(c1.classifications), 1)
         self.assertEqual(len(c1.get_classification_indices(target=self.example1)), 1)
     
+    def test_instance_index(self):
+        c1 = self.classifier.classify(taxonomic_item=self.t3.items[0], classification_target=self.example1)
+        c2 = c1.classify(taxonomic_item=self.t3.items[1], classification_target=self.example2)
+        # classifying from an older version branches off, without leaking into the later version
+        c3 = c1.classify(taxonomic_item=self.t3.items[0], classification_target="tiddles")
+        self.assertEqual(c2.get_classification_indices(target=self.example2), (1,))
+        self.assertEqual(c2.get_classification_indices(target="tiddles"), ())
+        self.assertEqual(c3.get_classification_indices(target="tiddles"), (0,))
+        self.assertEqual(c3.get_classification_indices(target=self.example2), ())
+        self.assertEqual(c1.get_classification_indices(target=self.example2), ())
+        c4 = c2.classify(taxonomic_item=self.t3.items[0], classification_target="tiddles")
+        self.assertEqual(c4.get_instance_position("tiddles"), (2,))
+
+    def test_classify_many(self):
+        pairs = (
+            (self.t3.items[0], self.example1),
+            (self.t3.items[1], 5),
+            (self.t3.items[1], self.example1),
+            (self.alt_t2.items[0], "rex"),
+            (self.t3.items[1], self.example2),
+        )
+        c1, rejected = self.classifier.classify_many(pairs)
+        self.assertEqual(c1.classified_instances, (self.example1, self.example2))
+        self.assertEqual(c1.classifications, (0, 1))
+        self.assertEqual(rejected, (
+            (pairs[1], CLASSIFICATION.TYPE_REJECT),
+            (pairs[2], CLASSIFICATION.EXCLUSIVITY_REJECT),
+            (pairs[3], CLASSIFICATION.TAXONOMY_REJECT),
+        ))
+        chained = self.classifier
+        for taxonomic_item, classification_target in pairs:
+            chained = chained.classify(taxonomic_item=taxonomic_item, classification_target=classification_target)
+        self.assertEqual(c1, chained)
+        c2, rejected = c1.classify_many(((self.t3.items[0], self.example2),))
+        self.assertIs(c2, c1)
+        self.assertEqual(rejected[0][1], CLASSIFICATION.EXCLUSIVITY_REJECT)
+
+    def test_classified_instances(self):
+        t4 = add_taxonomic_item(taxonomy = self.t3, name = "Kitten", parent = self.t3.items[0])
+        classifier = newExclusiveClassification(target_type = str, taxonomy = t4)
+        c1, _ = classifier.classify_many((
+            (t4.items[0], self.example1),
+            (t4.items[2], "tiddles"),
+            (t4.items[1], self.example2),
+            (t4.items[0], "felix"),
+        ))
+        self.assertEqual(c1.get_classified_instances(t4.items[0]), (self.example1, "felix"))
+        self.assertEqual(c1.get_classified_instances(t4.items[0], rollup = True), (self.example1, "felix", "tiddles"))
+        self.assertEqual(c1.get_classified_instances(t4.items[2], rollup = True), ("tiddles",))
+        self.assertEqual(c1.get_classified_instances(self.alt_t2.items[0]), ())
+
+    def test_exclusivity_validation(self):
+        with self.assertRaises(ValueError):
+            ExclusiveClassifier(target_type = str, taxonomy = self.t3, classified_instances = ("a", "b", "a"), classifications = (0, 1, 0))
+        with self.assertRaises(ValueError):
+            ExclusiveClassifier(target_type = list, taxonomy = self.t3, classified_instances = ([1], [1]), classifications = (0, 1))
+        c1 = newExclusiveClassification(target_type = list, taxonomy = self.t3)
+        c2 = c1.classify(taxonomic_item=self.t3.items[0], classification_target=[1])
+        self.assertIs(c2.classify(taxonomic_item=self.t3.items[1], classification_target=[1]), c2)
+        self.assertEqual(c2.get_classification_indices(target=[1]), (0,))
+
+    def test_trusted_construction(self):
+        c1 = self.classifier.classify(taxonomic_item=self.t3.items[1], classification_target=self.example1)
+        # the trusted path shares the already validated taxonomy, full validation copies it as it re-validates
+        self.assertIs(c1.taxonomy, self.classifier.taxonomy)
+        with full_validation():
+            c2 = self.classifier.classify(taxonomic_item=self.t3.items[1], classification_target=self.example1)
+            t4 = add_taxonomic_item(taxonomy = self.t3, name = "Bird")
+        self.assertIsNot(c2.taxonomy, self.classifier.taxonomy)
+        self.assertEqual(c1, c2)
+        self.assertEqual(add_taxonomic_item(taxonomy = self.t3, name = "Bird"), t4)
+
     def test_incorrect_classification(self):
         self.assertEqual(self.classifier.target_type, self.target_type)
         # test that an instance of the wrong type will not classify
@@ -120,6 +320,26 @@ class TestExclusiveClassifier(unittest.TestCase):
         self.assertEqual(len(c4.get_classification_indices(target=self.example1)), 1)
 
 
+    def test_base_classifier_is_abstract(self):
+        with self.assertRaises(TypeError):
+            BaseClassifier(target_type = self.target_type, taxonomy = self.t3)
+
+    def test_model_instances(self):
+        # pydantic models are unhashable, the classifier keys them by value all the same
+        classifier = newExclusiveClassification(target_type = Thing, taxonomy = self.t3)
+        classifier, rejected = classifier.classify_many((self.t3.items[number % 2], Thing(name = str(number))) for number in range(2000))
+        self.assertEqual(rejected, ())
+        self.assertEqual(classifier.classify(self.t3.items[0], Thing(name = "1999")), classifier)
+        self.assertEqual(classifier.get_classification_indices(Thing(name = "1999")), (1,))
+        with full_validation():
+            ExclusiveClassifier(**dict(classifier))
+            with self.assertRaises(ValueError):
+                ExclusiveClassifier(**(dict(classifier) | {
+                    'classified_instances': classifier.classified_instances.appended(Thing(name = "0")),
+                    'classifications': classifier.classifications.appended(0),
+                }))
+
+
 class TestInclusiveClassifier(unittest.TestCase):
 
 
@@ -172,6 +392,63 @@ class TestInclusiveClassifier(unittest.TestCase):
         self.assertEqual(len(c2.get_classification_indices(target=self.example1)), 1) # the function only returns the one tuple of classifications
         
     
+    def test_classify_many(self):
+        pairs = (
+            (self.t3.items[0], self.example1),
+            (self.t3.items[1], 5),
+            (self.t3.items[0], self.example2),
+            (self.alt_t2.items[0], self.example2),
+            (self.t3.items[1], self.example1),
+        )
+        c1, rejected = self.classifier.classify_many(pairs)
+        self.assertEqual(c1.classified_instances, (self.example1, self.example2))
+        self.assertEqual(c1.classifications, ((0, 1), (0,)))
+        self.assertEqual(c1.get_classified_instances(self.t3.items[0]), (self.example1, self.example2))
+        self.assertEqual(c1.get_classified_instances(self.t3.items[1]), (self.example1,))
+        self.assertEqual(rejected, (
+            (pairs[1], CLASSIFICATION.TYPE_REJECT),
+            (pairs[3], CLASSIFICATION.TAXONOMY_REJECT),
+        ))
+
+    def test_shared_classifications(self):
+        # two instances with equal classification tuples each find their own tuple
+        c1 = self.classifier.classify(taxonomic_item=self.t3.items[0], classification_target=self.example1)
+        c2 = c1.classify(taxonomic_item=self.t3.items[0], classification_target=self.example2)
+        c3 = c2.classify(taxonomic_item=self.t3.items[1], classification_target=self.example2)
+        self.assertEqual(c3.classifications, ((0,), (0, 1)))
+        self.assertEqual(c3.get_classification_indices(target=self.example2), ((0, 1),))
+        self.assertEqual(c2.classifications, ((0,), (0,)))
+        c4, _ = c3.classify_many(((self.t3.items[1], self.example1), (self.t3.items[1], "bus"), (self.t3.items[0], "bus")))
+        self.assertEqual(c4.classifications, ((0, 1), (0, 1), (1, 0)))
+
+    def test_repeated_classification(self):
+        # an instance classified again by the same item keeps a single entry for it
+        c1 = self.classifier.classify(taxonomic_item=self.t3.items[0], classification_target=self.example1)
+        self.assertIs(c1.classify(taxonomic_item=self.t3.items[0], classification_target=self.example1), c1)
+        pairs = (
+            (self.t3.items[0], self.example1),
+            (self.t3.items[1], self.example1),
+            (self.t3.items[1], self.example1),
+            (self.t3.items[1], self.example2),
+            (self.t3.items[1], self.example2),
+        )
+        c2, rejected = c1.classify_many(pairs)
+        self.assertEqual(c2.classifications, ((0, 1), (1,)))
+        self.assertEqual(rejected, tuple((pairs[position], CLASSIFICATION.DUPLICATE_REJECT) for position in (0, 2, 4)))
+
+    def test_declassify(self):
+        c1, _ = self.classifier.classify_many(((self.t3.items[0], self.example1), (self.t3.items[1], self.example1)))
+        c2 = c1.declassify(taxonomic_item=self.t3.items[0], classification_target=self.example1)
+        self.assertEqual(c2.get_classification_indices(target=self.example1), ((1,),))
+        self.assertEqual(c1.get_classification_indices(target=self.example1), ((0, 1),))
+        c3 = c2.declassify(taxonomic_item=self.t3.items[1], classification_target=self.example1)
+        self.assertEqual(c3.classified_instances, (self.example1,))
+        self.assertEqual(c3.classifications, ((),))
+        # nothing to remove
+        self.assertIs(c3.declassify(taxonomic_item=self.t3.items[1], classification_target=self.example1), c3)
+        self.assertIs(c3.declassify(taxonomic_item=self.t3.items[1], classification_target=self.example2), c3)
+        self.assertIs(c2.declassify(taxonomic_item=self.alt_t2.items[0], classification_target=self.example1), c2)
+
     def test_incorrect_classification(self):
         self.assertEqual(self.classifier.target_type, self.target_type)
         # test that an instance of the wrong type will not classify
@@ -183,7 +460,31 @@ class TestInclusiveClassifier(unittest.TestCase):
         # test that an instance of the right type will not classify by an arbitrary taxonomy item
         c4 = self.classifier.classify(taxonomic_item=self.t3.items[1], classification_target=self.example1)
         c5 = self.classifier.classify(taxonomic_item=self.alt_t2.items[0], classification_target=self.example1)
-        self.assertEqual(len(c5.classified_instances), 1)
-        self.assertEqual(len(c5.classifications), 1)
-        self.assertEqual(len(c5.get_classification_indices(target=self.example1)), 1)
+        self.assertEqual(len(c4.classified_instances), 1)
+        self.assertEqual(len(c4.classifications), 1)
+        self.assertEqual(len(c4.get_classification_indices(target=self.example1)), 1)
+        self.assertEqual(len(c5.classified_instances), 0)
+
+    def test_tracing(self):
+        events = []
+        def tracer(event, taxonomic_item, classification_target, elapsed):
+            events.append((event, taxonomic_item, classification_target))
+            self.assertGreaterEqual(elapsed, 0)
+        with classify_tracing(tracer):
+            c1 = self.classifier.classify(taxonomic_item=self.t3.items[0], classification_target=5)
+            c1 = c1.classify(taxonomic_item=self.alt_t2.items[0], classification_target=self.example1)
+            c1 = c1.classify(taxonomic_item=self.t3.items[0], classification_target=self.example1)
+            c1 = c1.classify(taxonomic_item=self.t3.items[1], classification_target=self.example1)
+            c1.classify_many(((self.t3.items[1], self.example2),))
+        self.assertEqual([event for event, _, _ in events], [
+            CLASSIFICATION.TYPE_REJECT,
+            CLASSIFICATION.TAXONOMY_REJECT,
+            CLASSIFICATION.NEW,
+            CLASSIFICATION.APPEND,
+            CLASSIFICATION.NEW,
+        ])
+        self.assertEqual(events[2][1:], (self.t3.items[0], self.example1))
+        # tracing stops with the context
+        self.classifier.classify(taxonomic_item=self.t3.items[0], classification_target=self.example1)
+        self.assertEqual(len(events), 5)
         
\ No newline at end of file